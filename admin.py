@@ -1,45 +1,27 @@
 # admin.py
 # admin.py
-import json
-import os
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from aiogram import Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from database import *
 from keyboards import *
+from outbound import outbound, PRIORITY_HIGH, priority
+from reaper import reaper, GAME_IDLE_TTL
+from routing import text_router
 
 logger = logging.getLogger(__name__)
 
 # ========== КОНФИГУРАЦИЯ ==========
 ADMIN_ID = 639219316  # Здесь установите ваш Telegram ID
-PROMO_FILE = "promo.json"
 
 # ========== ПРОВЕРКА АДМИНА ==========
 def is_admin(user_id: int) -> bool:
     """Проверяет, является ли пользователь администратором"""
     return user_id == ADMIN_ID
 
-# ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==========
-def load_promo_codes():
-    """Загружает промокоды из файла"""
-    if os.path.exists(PROMO_FILE):
-        try:
-            with open(PROMO_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_promo_codes(promo_codes):
-    """Сохраняет промокоды в файл"""
-    with open(PROMO_FILE, 'w', encoding='utf-8') as f:
-        json.dump(promo_codes, f, ensure_ascii=False, indent=2)
-
-PROMO_CODES = load_promo_codes()
-
 class AdminStates(StatesGroup):
     waiting_for_user_identifier = State()
     waiting_for_balance_amount = State()
@@ -55,41 +37,29 @@ async def handle_admin_stats(callback: CallbackQuery, bot: Bot):
         return
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) FROM users')
-        total_users = cursor.fetchone()[0]
-        
-        date_threshold = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute('SELECT COUNT(*) FROM users WHERE last_active >= ?', (date_threshold,))
-        active_users = cursor.fetchone()[0]
+        users_stats = await get_all_users_stats_async()
+        total_users = users_stats['total_users'] or 0
+        total_balance = users_stats['total_balance'] or 0
+        total_games = users_stats['total_games'] or 0
+        total_deposit = users_stats['total_deposit'] or 0
+        total_withdraw = users_stats['total_withdraw'] or 0
         
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute('SELECT COUNT(*) FROM users WHERE DATE(registered_at) = ?', (today,))
-        today_reg = cursor.fetchone()[0]
+        active_users = await get_active_users_count_async(7)
+        today_reg = await get_today_registrations_async()
         
-        cursor.execute('SELECT SUM(stars_balance) FROM users')
-        total_balance = cursor.fetchone()[0] or 0
+        pending = await get_pending_withdraws_async()
+        pending_withdraws = pending['count']
+        pending_amount = pending['total_amount']
         
-        cursor.execute('SELECT SUM(total_games) FROM users')
-        total_games = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT SUM(total_deposit) FROM users')
-        total_deposit = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT SUM(total_withdraw) FROM users')
-        total_withdraw = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT COUNT(*) FROM withdraw_requests WHERE status = "pending"')
-        pending_withdraws = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT SUM(amount) FROM withdraw_requests WHERE status = "pending"')
-        pending_amount = cursor.fetchone()[0] or 0
-        
-        total_lost = get_total_lost()
-        
-        conn.close()
+        total_lost = await get_total_lost_async()
+        cache_stats = get_profile_cache_stats()
+        outbound_stats = outbound.stats()
+        outbound_depth = ', '.join(f"{name}: {count}" for name, count in outbound_stats['depth'].items())
+        routing_stats = text_router.get_stats()
+        games_lines = '\n'.join(
+            f"├ {name}: {pool['active']} (убрано: {pool['expired']}, вытеснено: {pool['evicted']})"
+            for name, pool in reaper.stats().items()
+        )
         
         stats_text = f"""<b>📊 СТАТИСТИКА БОТА</b>
 
@@ -110,6 +80,22 @@ async def handle_admin_stats(callback: CallbackQuery, bot: Bot):
 ├ Всего выведено: {total_withdraw} ⭐
 └ Ожидает вывода: {pending_withdraws} заявок ({pending_amount} ⭐)
 
+🗄 <b>Кэш профилей:</b>
+├ Записей: {cache_stats['size']}
+└ Попаданий: {cache_stats['hit_rate']:.0%} ({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']})
+
+📨 <b>Исходящие:</b>
+├ В очереди: {sum(outbound_stats['depth'].values())} ({outbound_depth})
+├ Отправлено: {outbound_stats['sent']} (повторов: {outbound_stats['retries']}, потеряно: {outbound_stats['failed']})
+└ Задержка: {outbound_stats['avg_latency'] * 1000:.0f} мс в среднем, {outbound_stats['max_latency'] * 1000:.0f} мс макс.
+
+🧭 <b>Маршрутизация:</b>
+└ Сообщений: {routing_stats['routed']}, {routing_stats['avg_time'] * 1e6:.1f} мкс в среднем, {routing_stats['max_time'] * 1e6:.1f} мкс макс.
+
+🧹 <b>Незавершенные игры:</b>
+{games_lines}
+└ Брошенными считаются через {GAME_IDLE_TTL // 60} мин. без действий
+
 📅 <b>Дата:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}</blockquote>"""
         
         await callback.message.edit_text(stats_text, reply_markup=create_admin_back_keyboard())
@@ -142,7 +128,9 @@ async def handle_admin_promo_codes(callback: CallbackQuery):
         await callback.answer("❌ У вас нет прав администратора", show_alert=True)
         return
     
-    if not PROMO_CODES:
+    promo_codes = await get_all_promocodes_async()
+    
+    if not promo_codes:
         promo_text = """<b>🎫 Промокоды • Админ панель</b>
 
 Используйте команду:
@@ -153,22 +141,23 @@ async def handle_admin_promo_codes(callback: CallbackQuery):
         ])
     else:
         promo_list = []
-        for i, (code, info) in enumerate(PROMO_CODES.items(), 1):
-            used = info.get('used', 0)
-            max_uses = info.get('max_uses', 0)
-            reward = info.get('reward', 0)
-            active = info.get('active', True)
+        for i, info in enumerate(promo_codes, 1):
+            code = info['code']
+            used = info['used']
+            max_uses = info['max_uses']
+            reward = info['reward']
+            active = info['active']
             status = "✅ Активен" if active else "❌ Неактивен"
             
             promo_list.append(f"<b>{i}. {code}</b>")
             promo_list.append(f"   ├ Награда: {reward} ⭐")
-            promo_list.append(f"   ├ Использовано: {used}/{max_uses if max_uses != float('inf') else '∞'}")
+            promo_list.append(f"   ├ Использовано: {used}/{max_uses if max_uses is not None else '∞'}")
             promo_list.append(f"   └ Статус: {status}")
         
         promo_text = f"""<b>🎫 Промокоды • Админ панель</b>
 
 <b>ℹ️ Информация:</b>
-Всего промокодов: {len(PROMO_CODES)}
+Всего промокодов: {len(promo_codes)}
 
 <b>➕ Создать новый промокод:</b>
 <code>+НАЗВАНИЕ НАГРАДА АКТИВАЦИИ</code>"""
@@ -235,7 +224,7 @@ async def process_user_identifier(message: Message, state: FSMContext):
     data = await state.get_data()
     operation_type = data.get('operation_type', 'add')
     
-    user_data = get_user_by_id_or_username(identifier)
+    user_data = await get_user_by_id_or_username_async(identifier)
     
     if not user_data:
         await message.answer("❌ <b>Пользователь не найден!</b>\n\nПопробуйте снова или отмените командой /cancel")
@@ -290,7 +279,7 @@ async def process_balance_amount(message: Message, state: FSMContext):
             await message.answer(f"❌ <b>У пользователя недостаточно средств!</b>\n\nТекущий баланс: {old_balance} ⭐\nЗапрошенная сумма: {amount} ⭐")
             return
         
-        new_balance = update_user_balance_by_admin(target_user_id, amount, operation_type)
+        new_balance = await update_user_balance_by_admin_async(target_user_id, amount, operation_type)
         
         operation_word = "выдать" if operation_type == "add" else "забрать"
         operation_word_past = "выдано" if operation_type == "add" else "забрано"
@@ -360,21 +349,10 @@ async def create_promo_code(message: Message):
         reward = int(parts[1])
         max_uses = int(parts[2])
         
-        if code in PROMO_CODES:
+        if not await add_promocode_async(code, reward, max_uses, message.from_user.id):
             await message.answer(f"❌ <b>Промокод {code} уже существует!</b>")
             return
         
-        PROMO_CODES[code] = {
-            "reward": reward,
-            "max_uses": max_uses,
-            "used": 0,
-            "active": True,
-            "description": f"Промокод {code}",
-            "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        save_promo_codes(PROMO_CODES)
-        
         success_text = f"""<b>✅ Промокод создан!</b>
 
 <b>🎫 Код:</b> {code}
@@ -401,7 +379,7 @@ async def approve_withdraw(callback: CallbackQuery, bot: Bot):
         return
     
     request_id = int(callback.data.split("_")[1])
-    request_data = get_withdraw_request(request_id)
+    request_data = await get_withdraw_request_async(request_id)
     
     if not request_data:
         await callback.answer("❌ Заявка не найдена", show_alert=True)
@@ -411,8 +389,8 @@ async def approve_withdraw(callback: CallbackQuery, bot: Bot):
         await callback.answer(f"❌ Заявка уже обработана ({request_data['status']})", show_alert=True)
         return
     
-    update_withdraw_request(request_id, 'approved', callback.from_user.id)
-    update_user_withdraw(request_data['user_id'], request_data['amount'])
+    await update_withdraw_request_async(request_id, 'approved', callback.from_user.id)
+    await update_user_withdraw_async(request_data['user_id'], request_data['amount'])
     
     user_text = f"""<b>✅ Ваша заявка на вывод одобрена!</b>
 
@@ -424,7 +402,8 @@ async def approve_withdraw(callback: CallbackQuery, bot: Bot):
 Спасибо, что пользуетесь нашим сервисом! ❤️"""
     
     try:
-        await bot.send_message(request_data['user_id'], user_text)
+        with priority(PRIORITY_HIGH):
+            await bot.send_message(request_data['user_id'], user_text)
     except:
         pass
     
@@ -451,7 +430,7 @@ async def reject_withdraw(callback: CallbackQuery, bot: Bot):
         return
     
     request_id = int(callback.data.split("_")[1])
-    request_data = get_withdraw_request(request_id)
+    request_data = await get_withdraw_request_async(request_id)
     
     if not request_data:
         await callback.answer("❌ Заявка не найдена", show_alert=True)
@@ -461,7 +440,7 @@ async def reject_withdraw(callback: CallbackQuery, bot: Bot):
         await callback.answer(f"❌ Заявка уже обработана ({request_data['status']})", show_alert=True)
         return
     
-    update_withdraw_request(request_id, 'rejected', callback.from_user.id)
+    await update_withdraw_request_async(request_id, 'rejected', callback.from_user.id)
     
     user_text = f"""<b>❌ Ваша заявка на вывод отклонена</b>
 
@@ -473,7 +452,8 @@ async def reject_withdraw(callback: CallbackQuery, bot: Bot):
 Если у вас есть вопросы, обратитесь в поддержку."""
     
     try:
-        await bot.send_message(request_data['user_id'], user_text)
+        with priority(PRIORITY_HIGH):
+            await bot.send_message(request_data['user_id'], user_text)
     except:
         pass
     
@@ -532,10 +512,10 @@ async def process_view_profile_identifier(message: Message, state: FSMContext):
     
     identifier = message.text.strip()
     
-    user_data = get_user_by_id_or_username(identifier)
+    user_data = await get_user_by_id_or_username_async(identifier)
     
     if not user_data:
-        user_data = search_user_by_name(identifier)
+        user_data = await search_user_by_name_async(identifier)
         if not user_data:
             await message.answer("❌ <b>Пользователь не найден!</b>\n\nПопробуйте другой ID или username.")
             await state.clear()
@@ -546,22 +526,9 @@ async def process_view_profile_identifier(message: Message, state: FSMContext):
     if banned:
         ban_info = get_ban_info(user_data['user_id'])
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT COUNT(*) FROM withdraw_requests 
-    WHERE user_id = ? AND status = 'approved'
-    ''', (user_data['user_id'],))
-    successful_withdraws = cursor.fetchone()[0] or 0
-    
-    cursor.execute('''
-    SELECT SUM(amount) FROM withdraw_requests 
-    WHERE user_id = ? AND status = 'approved'
-    ''', (user_data['user_id'],))
-    total_withdrawn = cursor.fetchone()[0] or 0
-    
-    conn.close()
+    withdraw_summary = await get_user_withdraw_summary_async(user_data['user_id'])
+    successful_withdraws = withdraw_summary['count']
+    total_withdrawn = withdraw_summary['total_amount']
     
     try:
         reg_date = datetime.strptime(user_data['registered_at'], '%Y-%m-%d %H:%M:%S')
@@ -653,7 +620,7 @@ async def handle_admin_edit_balance_from_profile(callback: CallbackQuery, state:
     
     target_user_id = int(callback.data.split("_")[3])
     
-    user_data = get_user_by_id_or_username(str(target_user_id))
+    user_data = await get_user_by_id_or_username_async(str(target_user_id))
     
     if not user_data:
         await callback.answer("❌ Пользователь не найден", show_alert=True)
@@ -694,25 +661,13 @@ async def handle_admin_user_history(callback: CallbackQuery):
     
     target_user_id = int(callback.data.split("_")[3])
     
-    user_data = get_user_by_id_or_username(str(target_user_id))
+    user_data = await get_user_by_id_or_username_async(str(target_user_id))
     
     if not user_data:
         await callback.answer("❌ Пользователь не найден", show_alert=True)
         return
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT amount, status, created_at 
-    FROM withdraw_requests 
-    WHERE user_id = ? 
-    ORDER BY id DESC 
-    LIMIT 10
-    ''', (target_user_id,))
-    withdraws = cursor.fetchall()
-    
-    conn.close()
+    withdraws = await get_user_withdraw_history_async(target_user_id, 10)
     
     username_display = f"@{user_data['username']}" if user_data['username'] else user_data['first_name']
     
@@ -759,7 +714,7 @@ async def handle_admin_back_to_profile(callback: CallbackQuery):
     
     target_user_id = int(callback.data.split("_")[4])
     
-    user_data = get_user_by_id_or_username(str(target_user_id))
+    user_data = await get_user_by_id_or_username_async(str(target_user_id))
     
     if not user_data:
         await callback.answer("❌ Пользователь не найден", show_alert=True)
@@ -770,22 +725,9 @@ async def handle_admin_back_to_profile(callback: CallbackQuery):
     if banned:
         ban_info = get_ban_info(target_user_id)
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT COUNT(*) FROM withdraw_requests 
-    WHERE user_id = ? AND status = 'approved'
-    ''', (target_user_id,))
-    successful_withdraws = cursor.fetchone()[0] or 0
-    
-    cursor.execute('''
-    SELECT SUM(amount) FROM withdraw_requests 
-    WHERE user_id = ? AND status = 'approved'
-    ''', (target_user_id,))
-    total_withdrawn = cursor.fetchone()[0] or 0
-    
-    conn.close()
+    withdraw_summary = await get_user_withdraw_summary_async(target_user_id)
+    successful_withdraws = withdraw_summary['count']
+    total_withdrawn = withdraw_summary['total_amount']
     
     try:
         reg_date = datetime.strptime(user_data['registered_at'], '%Y-%m-%d %H:%M:%S')
@@ -876,7 +818,7 @@ async def handle_admin_ban_confirm(callback: CallbackQuery):
     
     target_user_id = int(callback.data.split("_")[3])
     
-    user_data = get_user_by_id_or_username(str(target_user_id))
+    user_data = await get_user_by_id_or_username_async(str(target_user_id))
     
     if not user_data:
         await callback.answer("❌ Пользователь не найден", show_alert=True)
@@ -914,13 +856,13 @@ async def handle_admin_ban_execute(callback: CallbackQuery, bot: Bot):
     
     target_user_id = int(callback.data.split("_")[3])
     
-    user_data = get_user_by_id_or_username(str(target_user_id))
+    user_data = await get_user_by_id_or_username_async(str(target_user_id))
     
     if not user_data:
         await callback.answer("❌ Пользователь не найден", show_alert=True)
         return
     
-    ban_user(
+    await ban_user_async(
         user_id=target_user_id,
         username=user_data['username'],
         first_name=user_data['first_name'],
@@ -973,7 +915,7 @@ async def handle_admin_ban_cancel(callback: CallbackQuery):
     
     target_user_id = int(callback.data.split("_")[3])
     
-    user_data = get_user_by_id_or_username(str(target_user_id))
+    user_data = await get_user_by_id_or_username_async(str(target_user_id))
     
     if not user_data:
         await callback.answer("❌ Пользователь не найден", show_alert=True)
@@ -1002,7 +944,7 @@ async def handle_admin_unban_confirm(callback: CallbackQuery):
     
     target_user_id = int(callback.data.split("_")[3])
     
-    user_data = get_user_by_id_or_username(str(target_user_id))
+    user_data = await get_user_by_id_or_username_async(str(target_user_id))
     
     if not user_data:
         await callback.answer("❌ Пользователь не найден", show_alert=True)
@@ -1047,13 +989,13 @@ async def handle_admin_unban_execute(callback: CallbackQuery, bot: Bot):
     
     target_user_id = int(callback.data.split("_")[3])
     
-    user_data = get_user_by_id_or_username(str(target_user_id))
+    user_data = await get_user_by_id_or_username_async(str(target_user_id))
     
     if not user_data:
         await callback.answer("❌ Пользователь не найден", show_alert=True)
         return
     
-    unban_user(target_user_id)
+    await unban_user_async(target_user_id)
     
     username_display = f"@{user_data['username']}" if user_data['username'] else user_data['first_name']
     current_time = datetime.now().strftime('%d.%m.%Y %H:%M')
@@ -1097,7 +1039,7 @@ async def handle_admin_unban_cancel(callback: CallbackQuery):
     
     target_user_id = int(callback.data.split("_")[3])
     
-    user_data = get_user_by_id_or_username(str(target_user_id))
+    user_data = await get_user_by_id_or_username_async(str(target_user_id))
     
     if not user_data:
         await callback.answer("❌ Пользователь не найден", show_alert=True)
@@ -0,0 +1,208 @@
+# animations.py
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from outbound import PRIORITY_LOW, PRIORITY_NORMAL, outbound, priority
+
+logger = logging.getLogger(__name__)
+
+# Бюджет на промежуточные кадры: сколько правок в секунду на всего бота
+# и как часто можно трогать один чат. Кадр пропускается и тогда, когда у чата
+# нет токена в очереди исходящих (в группе это ~20 сообщений в минуту):
+# иначе старые кадры стояли бы в очереди перед итогом. Итоговые кадры идут всегда
+ANIMATION_EDITS_PER_SECOND = 20
+ANIMATION_CHAT_INTERVAL = 0.5
+ANIMATION_CHAT_MEMORY = 10000  # после скольких чатов чистить время последней правки
+
+class Animation:
+    """Одна анимация: кадры по времени и итоговый кадр с результатом"""
+    __slots__ = ('chat_id', 'timeline', 'replace', 'result_priority', 'message_id', 'step')
+    
+    def __init__(self, chat_id, timeline, replace, result_priority=PRIORITY_NORMAL):
+        self.chat_id = chat_id
+        self.timeline = timeline  # [(момент показа, текст)], последний - итог
+        self.replace = replace  # итог новым сообщением вместо правки анимации
+        self.result_priority = result_priority  # приоритет исходящих запросов итогового кадра
+        self.message_id = None
+        self.step = 0
+    
+    def is_final(self, step):
+        return step == len(self.timeline) - 1
+
+class AnimationScheduler:
+    """Планировщик анимаций игр.
+    
+    Результат игры считается сразу, обработчик ставит анимацию в очередь
+    и освобождается. Кадры всех игр показывает одна фоновая задача
+    по общему таймеру. Если кадр опоздал, показывается сразу последний
+    наступивший. Если правок слишком много или Telegram просит подождать,
+    промежуточные кадры выбрасываются, а итог откладывается, но не теряется"""
+    
+    def __init__(self, edits_per_second=ANIMATION_EDITS_PER_SECOND, chat_interval=ANIMATION_CHAT_INTERVAL):
+        self.edits_per_second = edits_per_second
+        self.chat_interval = chat_interval
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self._bot = None
+        self._task = None
+        self._wakeup = None
+        self._advancing = set()  # задачи кадров, которые сейчас показываются
+        self._heap = []  # (момент, номер, анимация)
+        self._counter = itertools.count()
+        self._recent = deque()  # моменты правок за последнюю секунду
+        self._chat_last = {}  # chat_id -> момент последней правки
+        self._paused_until = 0.0
+    
+    def start(self, bot: Bot):
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Останавливает таймер и сразу показывает итоги незавершенных анимаций"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        # Дожидаемся кадров, которые уже показываются: они могут вернуть
+        # анимацию в очередь, и тогда ее итог покажем ниже
+        if self._advancing:
+            await asyncio.gather(*self._advancing, return_exceptions=True)
+        pending, self._heap = self._heap, []
+        for _, _, animation in pending:
+            animation.step = len(animation.timeline) - 1
+            await self._show(animation)
+    
+    def play(self, chat_id, frames, result, result_delay, replace=False, result_priority=PRIORITY_NORMAL):
+        """Ставит анимацию в очередь.
+        frames - [(задержка от начала, текст)], первый кадр отправляется новым сообщением.
+        result - итоговый текст, показывается через result_delay секунд.
+        result_priority - приоритет итога в очереди исходящих запросов"""
+        start = time.monotonic()
+        timeline = [(start + delay, text) for delay, text in frames]
+        timeline.append((start + result_delay, result))
+        self._push(timeline[0][0], Animation(chat_id, timeline, replace, result_priority))
+    
+    def send_later(self, chat_id, text, delay):
+        """Отправляет сообщение через delay секунд, не занимая обработчик"""
+        self.play(chat_id, [], text, delay)
+    
+    def stats(self):
+        return {
+            'pending': len(self._heap),
+            'frames_sent': self.frames_sent,
+            'frames_dropped': self.frames_dropped
+        }
+    
+    def _push(self, when, animation):
+        heapq.heappush(self._heap, (when, next(self._counter), animation))
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, animation = heapq.heappop(self._heap)
+                # Ссылку на задачу держим сами, иначе ее может собрать сборщик мусора
+                task = asyncio.create_task(self._advance(animation, now))
+                self._advancing.add(task)
+                task.add_done_callback(self._advancing.discard)
+    
+    def _allow(self, chat_id, now):
+        """Можно ли сейчас показать промежуточный кадр в этом чате"""
+        if now < self._paused_until:
+            return False
+        if now - self._chat_last.get(chat_id, 0.0) < self.chat_interval:
+            return False
+        while self._recent and now - self._recent[0] >= 1:
+            self._recent.popleft()
+        return len(self._recent) < self.edits_per_second and outbound.ready(chat_id)
+    
+    def _spent(self, chat_id, now):
+        self._recent.append(now)
+        if len(self._chat_last) > ANIMATION_CHAT_MEMORY:
+            self._chat_last = {
+                chat: last for chat, last in self._chat_last.items()
+                if now - last < self.chat_interval
+            }
+        self._chat_last[chat_id] = now
+    
+    async def _advance(self, animation, now):
+        timeline = animation.timeline
+        
+        # Опоздавшие кадры склеиваются: показываем последний наступивший
+        step = animation.step
+        while step + 1 < len(timeline) and timeline[step + 1][0] <= now:
+            step += 1
+        self.frames_dropped += step - animation.step
+        animation.step = step
+        
+        if animation.is_final(step):
+            if now < self._paused_until:
+                self._push(self._paused_until, animation)
+                return
+            await self._show(animation)
+            return
+        
+        if self._allow(animation.chat_id, now):
+            await self._show(animation)
+        else:
+            self.frames_dropped += 1
+        
+        animation.step = step + 1
+        self._push(timeline[step + 1][0], animation)
+    
+    async def _show(self, animation):
+        """Показывает текущий кадр анимации"""
+        chat_id = animation.chat_id
+        text = animation.timeline[animation.step][1]
+        final = animation.is_final(animation.step)
+        self._spent(chat_id, time.monotonic())
+        
+        try:
+            # Промежуточные кадры уступают очередь обычным ответам
+            with priority(animation.result_priority if final else PRIORITY_LOW):
+                if animation.message_id is None:
+                    sent = await self._bot.send_message(chat_id, text)
+                    animation.message_id = sent.message_id
+                elif final and animation.replace:
+                    await self._bot.delete_message(chat_id, animation.message_id)
+                    await self._bot.send_message(chat_id, text)
+                else:
+                    await self._bot.edit_message_text(text=text, chat_id=chat_id, message_id=animation.message_id)
+            self.frames_sent += 1
+        except TelegramRetryAfter as e:
+            self._paused_until = time.monotonic() + e.retry_after
+            logger.warning(f"Анимации приостановлены на {e.retry_after} сек. по требованию Telegram")
+            if final:
+                self._push(self._paused_until, animation)
+            else:
+                self.frames_dropped += 1
+        except TelegramAPIError as e:
+            # Сообщение анимации удалено или не изменилось - итог отправим новым сообщением
+            logger.debug(f"Кадр анимации в чате {chat_id} не показан: {e}")
+            if final and animation.message_id is not None:
+                animation.message_id = None
+                await self._show(animation)
+            else:
+                self.frames_dropped += 1
+
+animator = AnimationScheduler()
\ No newline at end of file
@@ -1,22 +1,372 @@
 # database.py
 import sqlite3
 import json
-from datetime import datetime
+import asyncio
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import os
 
 DB_NAME = 'casino_bot.db'
+PROMO_FILE = 'promo.json'  # Старое хранилище промокодов, переносится миграцией 003
+DB_POOL_SIZE = 8  # Сколько простаивающих соединений держать открытыми
+DB_HEALTHCHECK_INTERVAL = 30  # Через сколько секунд простоя проверять соединение
+
+# Отложенная запись статистики: буфер сбрасывается раз в интервал
+# или сразу, когда в нем набирается WRITE_BEHIND_BATCH_SIZE записей
+WRITE_BEHIND_INTERVAL = 0.2
+WRITE_BEHIND_BATCH_SIZE = 500
+
+# Кэш профилей: сколько профилей держать и сколько секунд им доверять
+PROFILE_CACHE_SIZE = 10000
+PROFILE_CACHE_TTL = 30
+PROFILE_CACHE_STRIPES = 4096  # на сколько групп пользователей делятся поколения кэша
+
+# Настройки, которые применяются к каждому новому соединению
+DB_PRAGMAS = {
+    'synchronous': 'NORMAL',  # В режиме WAL безопасно и без fsync на каждый коммит
+    'cache_size': -16000,  # ~16 МБ кэша страниц
+    'mmap_size': 268435456,  # 256 МБ отображаются в память
+    'temp_store': 'MEMORY',
+}
+
+class ConnectionPool:
+    """Пул долгоживущих соединений с базой данных"""
+    
+    def __init__(self, db_name, size=DB_POOL_SIZE, healthcheck_interval=DB_HEALTHCHECK_INTERVAL):
+        self.db_name = db_name
+        self.size = size
+        self.healthcheck_interval = healthcheck_interval
+        self._idle = []  # (соединение, время возврата в пул)
+        self._lock = threading.Lock()
+        self._closed = False
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in DB_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name}={value}')
+        return conn
+    
+    def _is_alive(self, conn):
+        try:
+            conn.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def acquire(self):
+        """Берет соединение из пула или открывает новое"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, released_at = self._idle.pop()
+            
+            # Долго простаивавшие соединения проверяем перед выдачей
+            if time.monotonic() - released_at < self.healthcheck_interval or self._is_alive(conn):
+                return conn
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        
+        return self._connect()
+    
+    def release(self, conn):
+        """Возвращает соединение в пул"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+    
+    def close_all(self):
+        """Закрывает все соединения пула"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+class PooledConnection:
+    """Соединение из пула: close() возвращает его в пул, а не закрывает"""
+    
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+_pool = ConnectionPool(DB_NAME)
+
+# Отдельные потоки для запросов, чтобы не блокировать цикл событий бота
+_db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix='db')
 
 def get_db_connection():
-    """Создает соединение с базой данных"""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Выдает соединение с базой данных из пула"""
+    return PooledConnection(_pool, _pool.acquire())
 
-def create_users_table():
-    """Создает таблицу пользователей"""
+@contextmanager
+def transaction():
+    """Выдает соединение с открытой транзакцией: коммит при успехе, откат при ошибке"""
     conn = get_db_connection()
-    cursor = conn.cursor()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+class WriteBehindBuffer:
+    """Буфер отложенной записи: копит статистику игр, счетчики игр и отметки
+    активности и пишет их пачкой в одной транзакции"""
+    
+    def __init__(self, batch_size=WRITE_BEHIND_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._game_stats = []  # строки для game_stats
+        self._games_count = {}  # user_id -> сколько игр добавить
+        self._last_active = set()  # user_id, которым обновить last_active
+        self._pending = 0
+    
+    def pending(self):
+        """Сколько записей ждет сброса"""
+        return self._pending
+    
+    def _added(self):
+        # Производитель, переполнивший буфер, сам ждет сброса - так буфер
+        # не растет бесконечно, если база не успевает. Деньги к этому моменту
+        # уже записаны, поэтому ошибка сброса не должна дойти до производителя:
+        # данные остались в буфере, их запишет следующая попытка
+        if self._pending >= self.batch_size:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Ошибка записи буфера статистики: {e}")
+    
+    def add_game_stat(self, user_id, game_type, bet_amount, win_amount, net_result):
+        self.add_game_stats([(user_id, game_type, bet_amount, win_amount, net_result)])
+    
+    def add_game_stats(self, rows):
+        with self._lock:
+            self._game_stats.extend(rows)
+            self._pending += len(rows)
+        self._added()
+    
+    def add_games_count(self, user_id, count=1):
+        with self._lock:
+            self._games_count[user_id] = self._games_count.get(user_id, 0) + count
+            self._pending += 1
+        self._added()
+    
+    def touch(self, user_id):
+        # Отметку ставят прямо в цикле событий, поэтому она сама буфер не сбрасывает:
+        # множество отметок ограничено числом пользователей, его запишет фоновая задача
+        with self._lock:
+            if user_id in self._last_active:
+                return
+            self._last_active.add(user_id)
+            self._pending += 1
+    
+    def _take(self):
+        with self._lock:
+            batch = (self._game_stats, self._games_count, self._last_active)
+            self._game_stats, self._games_count, self._last_active = [], {}, set()
+            self._pending = 0
+        return batch
+    
+    def _put_back(self, batch):
+        game_stats, games_count, last_active = batch
+        with self._lock:
+            self._game_stats[:0] = game_stats
+            for user_id, count in games_count.items():
+                self._games_count[user_id] = self._games_count.get(user_id, 0) + count
+            self._last_active |= last_active
+            self._pending = len(self._game_stats) + len(self._games_count) + len(self._last_active)
+    
+    def flush(self):
+        """Записывает накопленное одной транзакцией. Возвращает число записей"""
+        with self._flush_lock:
+            batch = self._take()
+            game_stats, games_count, last_active = batch
+            if not (game_stats or games_count or last_active):
+                return 0
+            
+            try:
+                with transaction() as conn:
+                    if game_stats:
+                        conn.executemany('''
+                        INSERT INTO game_stats (user_id, game_type, bet_amount, win_amount, net_result)
+                        VALUES (?, ?, ?, ?, ?)
+                        ''', game_stats)
+                    if games_count:
+                        conn.executemany('''
+                        UPDATE users 
+                        SET total_games = total_games + ?, last_active = CURRENT_TIMESTAMP 
+                        WHERE user_id = ?
+                        ''', [(count, user_id) for user_id, count in games_count.items()])
+                    touched = last_active - games_count.keys()
+                    if touched:
+                        conn.executemany('''
+                        UPDATE users 
+                        SET last_active = CURRENT_TIMESTAMP 
+                        WHERE user_id = ?
+                        ''', [(user_id,) for user_id in touched])
+            except Exception:
+                # Не теряем данные: вернем их в буфер до следующей попытки
+                self._put_back(batch)
+                raise
+            
+            # Отметки активности кэш не сбрасывают, иначе он бы не жил дольше одного обновления
+            if games_count:
+                _profile_cache.invalidate(*games_count)
+            
+            return len(game_stats) + len(games_count) + len(last_active)
+
+_write_behind = WriteBehindBuffer()
+
+async def run_write_behind(interval=WRITE_BEHIND_INTERVAL):
+    """Фоновая задача: периодически сбрасывает буфер отложенной записи"""
+    while True:
+        await asyncio.sleep(interval)
+        if _write_behind.pending():
+            try:
+                await run_db(_write_behind.flush)
+            except Exception as e:
+                print(f"❌ Ошибка записи буфера статистики: {e}")
+
+def flush_write_behind():
+    """Сразу записывает все, что накопилось в буфере отложенной записи"""
+    return _write_behind.flush()
+
+async def run_db(func, *args, **kwargs):
+    """Выполняет синхронную функцию базы данных в потоке для запросов"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
+
+def _make_async(func):
+    """Делает awaitable-версию функции базы данных"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    wrapper.__name__ = wrapper.__qualname__ = f'{func.__name__}_async'
+    return wrapper
+
+class ProfileCache:
+    """LRU-кэш профилей пользователей с временем жизни записи.
+    Писатели баланса и счетчиков сбрасывают запись после коммита. Обновлять ее
+    на месте нельзя: потоки базы могут дойти до кэша не в порядке коммитов,
+    и в кэше остался бы старый баланс"""
+    
+    def __init__(self, maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL, stripes=PROFILE_CACHE_STRIPES):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # user_id -> (момент устаревания, профиль)
+        # Поколения растут при каждом изменении, см. put. Поколение свое у каждой
+        # группы пользователей (user_id % stripes), поэтому изменение одного
+        # пользователя не мешает кэшировать остальных. Совпадение группы
+        # у разных пользователей лишь изредка пропускает заполнение кэша
+        self._epoch = 0  # растет при clear
+        self._generations = [0] * stripes
+    
+    def get(self, user_id):
+        """Возвращает копию профиля из кэша или None"""
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[user_id]
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[1])
+    
+    def _stripe(self, user_id):
+        return hash(user_id) % len(self._generations)
+    
+    def _bump(self, user_id):
+        self._generations[self._stripe(user_id)] += 1
     
+    def generation(self, user_id):
+        """Поколение записи пользователя, снимается до чтения из базы"""
+        return self._epoch, self._generations[self._stripe(user_id)]
+    
+    def put(self, user_id, profile, generation):
+        """Кладет профиль, прочитанный из базы. Если с момента чтения
+        кто-то успел изменить этого пользователя, профиль мог устареть - не кладем его"""
+        with self._lock:
+            if generation != self.generation(user_id):
+                return
+            self._data[user_id] = (time.monotonic() + self.ttl, dict(profile))
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._bump(user_id)
+                self._data.pop(user_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+    
+    def stats(self):
+        """Размер кэша и счетчики попаданий"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+_profile_cache = ProfileCache()
+
+def get_profile_cache_stats():
+    """Статистика кэша профилей"""
+    return _profile_cache.stats()
+
+def close_db():
+    """Закрывает соединения с базой данных при остановке бота"""
+    _db_executor.shutdown(wait=True)
+    _write_behind.flush()
+    _pool.close_all()
+
+# ========== СХЕМА И МИГРАЦИИ ==========
+
+def migration_001_initial_schema(cursor):
+    """Начальная схема: пользователи, выводы, промокоды, статистика игр, баны"""
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
         user_id INTEGER PRIMARY KEY,
@@ -31,14 +381,6 @@ def create_users_table():
     )
     ''')
     
-    conn.commit()
-    conn.close()
-
-def create_withdraw_requests_table():
-    """Создает таблицу заявок на вывод"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS withdraw_requests (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -52,14 +394,6 @@ def create_withdraw_requests_table():
     )
     ''')
     
-    conn.commit()
-    conn.close()
-
-def create_promocodes_table():
-    """Создает таблицу использованных промокодов"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS used_promocodes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -71,14 +405,6 @@ def create_promocodes_table():
     )
     ''')
     
-    conn.commit()
-    conn.close()
-
-def create_game_stats_table():
-    """Создает таблицу для отслеживания проигранных сумм"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS game_stats (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -92,14 +418,6 @@ def create_game_stats_table():
     )
     ''')
     
-    conn.commit()
-    conn.close()
-
-def create_bans_table():
-    """Создает таблицу для банов"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS bans (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -111,18 +429,204 @@ def create_bans_table():
         banned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     ''')
+
+def migration_002_hot_path_indexes(cursor):
+    """Индексы для частых запросов: статистика игр, выводы, активность, username"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_game_stats_user_played ON game_stats (user_id, played_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_withdraw_requests_status ON withdraw_requests (status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_withdraw_requests_user ON withdraw_requests (user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_last_active ON users (last_active)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_registered_at ON users (registered_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_username_lower ON users (LOWER(username))')
+
+def migration_003_promocodes(cursor):
+    """Промокоды в базе вместо promo.json"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS promocodes (
+        code TEXT PRIMARY KEY,
+        reward INTEGER NOT NULL DEFAULT 0,
+        max_uses INTEGER,
+        used INTEGER NOT NULL DEFAULT 0,
+        active INTEGER NOT NULL DEFAULT 1,
+        created_by INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    
+    # Переносим промокоды, созданные до миграции
+    if not os.path.exists(PROMO_FILE):
+        return
+    try:
+        with open(PROMO_FILE, 'r', encoding='utf-8') as f:
+            promo_codes = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Не удалось прочитать {PROMO_FILE}: {e}")
+        return
+    
+    cursor.executemany('''
+    INSERT OR IGNORE INTO promocodes (code, reward, max_uses, used, active, created_by)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        (
+            code.upper(),
+            info.get('reward', 0),
+            None if info.get('max_uses', 0) == float('inf') else info.get('max_uses', 0),
+            info.get('used', 0),
+            1 if info.get('active', True) else 0,
+            info.get('created_by')
+        )
+        for code, info in promo_codes.items()
+    ])
+
+def migration_004_promo_claims_index(cursor):
+    """Индекс активаций по промокоду для загрузки списка активировавших"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_used_promocodes_code ON used_promocodes (promocode)')
+
+def migration_005_active_games(cursor):
+    """Незавершенные игры, чтобы перезапуск не терял ставки"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS active_games (
+        kind TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (kind, user_id)
+    ) WITHOUT ROWID
+    ''')
+
+# Миграции применяются по порядку, номер версии никогда не меняется.
+# Новую миграцию добавляйте в конец списка.
+MIGRATIONS = [
+    (1, migration_001_initial_schema),
+    (2, migration_002_hot_path_indexes),
+    (3, migration_003_promocodes),
+    (4, migration_004_promo_claims_index),
+    (5, migration_005_active_games),
+]
+
+# ========== ЧАСТЫЕ ЗАПРОСЫ ==========
+# Эти запросы должны идти по индексам, их планы проверяет tests/test_queries.py
+
+SQL_USER_GAME_STATS = '''
+    SELECT 
+        game_type,
+        COUNT(*) as games_played,
+        SUM(bet_amount) as total_bet,
+        SUM(win_amount) as total_win,
+        SUM(net_result) as total_profit
+    FROM game_stats 
+    WHERE user_id = ?
+    GROUP BY game_type
+'''
+
+SQL_USER_WITHDRAW_HISTORY = '''
+    SELECT amount, status, created_at 
+    FROM withdraw_requests 
+    WHERE user_id = ? 
+    ORDER BY id DESC 
+    LIMIT ?
+'''
+
+SQL_PENDING_WITHDRAWS = '''
+    SELECT 
+        COUNT(*) as count,
+        SUM(amount) as total_amount
+    FROM withdraw_requests 
+    WHERE status = 'pending'
+'''
+
+SQL_ACTIVE_USERS_COUNT = '''
+    SELECT COUNT(*) as active_users
+    FROM users 
+    WHERE last_active >= datetime('now', ?)
+'''
+
+# Диапазон вместо DATE(registered_at), чтобы работал индекс
+SQL_TODAY_REGISTRATIONS = '''
+    SELECT COUNT(*) as today_reg
+    FROM users 
+    WHERE registered_at >= DATE('now') AND registered_at < DATE('now', '+1 day')
+'''
+
+# Username в Telegram не зависит от регистра
+SQL_USER_BY_USERNAME = 'SELECT * FROM users WHERE LOWER(username) = LOWER(?)'
+
+SQL_PROMO_CLAIMERS = 'SELECT user_id FROM used_promocodes WHERE promocode = ?'
+
+HOT_QUERIES = {
+    'get_user_game_stats': (SQL_USER_GAME_STATS, (0,)),
+    'get_user_withdraw_history': (SQL_USER_WITHDRAW_HISTORY, (0, 10)),
+    'get_pending_withdraws': (SQL_PENDING_WITHDRAWS, ()),
+    'get_active_users_count': (SQL_ACTIVE_USERS_COUNT, ('-7 days',)),
+    'get_today_registrations': (SQL_TODAY_REGISTRATIONS, ()),
+    'get_user_by_id_or_username': (SQL_USER_BY_USERNAME, ('',)),
+    'get_promo_claimers': (SQL_PROMO_CLAIMERS, ('',)),
+}
+
+def find_full_scans():
+    """Возвращает частые запросы, которые читают таблицу целиком (по EXPLAIN QUERY PLAN).
+    Проверяется тестом tests/test_queries.py"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    result = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        scans = [row[3] for row in cursor.fetchall()
+                 if row[3].startswith('SCAN') and row[3] != 'SCAN CONSTANT ROW']
+        if scans:
+            result[name] = scans
     
-    conn.commit()
     conn.close()
+    return result
+
+def get_schema_version():
+    """Получает текущую версию схемы базы данных"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='schema_version'")
+    if not cursor.fetchone():
+        conn.close()
+        return 0
+    
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    version = cursor.fetchone()[0]
+    conn.close()
+    return version or 0
 
 def init_db():
-    """Инициализирует базу данных, создает таблицы если их нет"""
-    create_users_table()
-    create_withdraw_requests_table()
-    create_promocodes_table()
-    create_game_stats_table()
-    create_bans_table()
-    print("✅ База данных инициализирована")
+    """Инициализирует базу данных: включает WAL и применяет недостающие миграции"""
+    # WAL сохраняется в файле базы, достаточно включить один раз
+    conn = get_db_connection()
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.close()
+    
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+        current_version = cursor.fetchone()[0] or 0
+        
+        for version, migration in MIGRATIONS:
+            if version <= current_version:
+                continue
+            migration(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, migration.__doc__)
+            )
+            current_version = version
+    
+    load_banned_users()
+    
+    print(f"✅ База данных инициализирована (версия схемы: {current_version})")
 
 def is_user_new(user_id):
     """Проверяет, есть ли пользователь в базе"""
@@ -155,9 +659,16 @@ def update_user_balance(user_id, amount):
     ''', (amount, user_id))
     conn.commit()
     conn.close()
+    
+    _profile_cache.invalidate(user_id)
 
 def get_user_profile(user_id):
-    """Получает профиль пользователя"""
+    """Получает профиль пользователя (сначала из кэша)"""
+    profile = _profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+    
+    generation = _profile_cache.generation(user_id)
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
@@ -179,7 +690,9 @@ def get_user_profile(user_id):
     conn.close()
     
     if row:
-        return dict(row)
+        profile = dict(row)
+        _profile_cache.put(user_id, profile, generation)
+        return profile
     return None
 
 def update_user_deposit(user_id, amount):
@@ -193,6 +706,8 @@ def update_user_deposit(user_id, amount):
     ''', (amount, user_id))
     conn.commit()
     conn.close()
+    
+    _profile_cache.invalidate(user_id)
 
 def update_user_withdraw(user_id, amount):
     """Обновляет общую сумму выводов"""
@@ -205,29 +720,51 @@ def update_user_withdraw(user_id, amount):
     ''', (amount, user_id))
     conn.commit()
     conn.close()
+    
+    _profile_cache.invalidate(user_id)
 
 def update_user_games_count(user_id):
-    """Обновляет счетчик игр"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-    UPDATE users 
-    SET total_games = total_games + 1, last_active = CURRENT_TIMESTAMP 
-    WHERE user_id = ?
-    ''', (user_id,))
-    conn.commit()
-    conn.close()
+    """Обновляет счетчик игр (через буфер отложенной записи)"""
+    _write_behind.add_games_count(user_id)
+
+# ========== БАНЫ ==========
+# Баны проверяются на каждое обновление, поэтому держим их в памяти:
+# кэш загружается при старте и обновляется в ban_user / unban_user
+
+_banned_users = {}  # user_id -> информация о бане
+_bans_loaded = False
+_bans_lock = threading.Lock()
+
+def _ban_row_to_dict(ban):
+    return {
+        'user_id': ban[0],
+        'username': ban[1],
+        'first_name': ban[2],
+        'reason': ban[3],
+        'banned_by': ban[4],
+        'banned_at': ban[5]
+    }
+
+def load_banned_users():
+    """Загружает всех забаненных пользователей в память"""
+    global _bans_loaded
+    bans = get_all_banned_users()
+    with _bans_lock:
+        _banned_users.clear()
+        for ban in bans:
+            _banned_users[ban['user_id']] = ban
+        _bans_loaded = True
+    return len(bans)
+
+def _forget_ban(user_id):
+    with _bans_lock:
+        _banned_users.pop(user_id, None)
 
 def is_user_banned(user_id):
     """Проверяет, забанен ли пользователь"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM bans WHERE user_id = ?', (user_id,))
-    result = cursor.fetchone()
-    
-    conn.close()
-    return bool(result)
+    if not _bans_loaded:
+        load_banned_users()
+    return user_id in _banned_users
 
 def ban_user(user_id, username, first_name, reason, admin_id):
     """Банит пользователя"""
@@ -237,10 +774,15 @@ def ban_user(user_id, username, first_name, reason, admin_id):
     cursor.execute('''
     INSERT OR REPLACE INTO bans (user_id, username, first_name, reason, banned_by)
     VALUES (?, ?, ?, ?, ?)
+    RETURNING user_id, username, first_name, reason, banned_by, banned_at
     ''', (user_id, username, first_name, reason, admin_id))
+    ban = cursor.fetchone()
     
     conn.commit()
     conn.close()
+    
+    with _bans_lock:
+        _banned_users[user_id] = _ban_row_to_dict(ban)
 
 def unban_user(user_id):
     """Разбанивает пользователя"""
@@ -251,31 +793,15 @@ def unban_user(user_id):
     
     conn.commit()
     conn.close()
+    
+    _forget_ban(user_id)
 
 def get_ban_info(user_id):
     """Получает информацию о бане пользователя"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT user_id, username, first_name, reason, banned_by, banned_at 
-    FROM bans 
-    WHERE user_id = ?
-    ''', (user_id,))
-    
-    ban = cursor.fetchone()
-    conn.close()
-    
-    if ban:
-        return {
-            'user_id': ban[0],
-            'username': ban[1],
-            'first_name': ban[2],
-            'reason': ban[3],
-            'banned_by': ban[4],
-            'banned_at': ban[5]
-        }
-    return None
+    if not _bans_loaded:
+        load_banned_users()
+    ban = _banned_users.get(user_id)
+    return dict(ban) if ban else None
 
 def get_all_banned_users():
     """Получает список всех забаненных пользователей"""
@@ -291,18 +817,7 @@ def get_all_banned_users():
     bans = cursor.fetchall()
     conn.close()
     
-    result = []
-    for ban in bans:
-        result.append({
-            'user_id': ban[0],
-            'username': ban[1],
-            'first_name': ban[2],
-            'reason': ban[3],
-            'banned_by': ban[4],
-            'banned_at': ban[5]
-        })
-    
-    return result
+    return [_ban_row_to_dict(ban) for ban in bans]
 
 def search_user_by_name(name_part):
     """Ищет пользователя по части имени"""
@@ -378,39 +893,133 @@ def update_withdraw_request(request_id, status, admin_id):
     conn.commit()
     conn.close()
 
-def has_user_used_promo(user_id, promocode):
-    """Проверяет, использовал ли пользователь промокод"""
+def get_user_withdraw_summary(user_id):
+    """Получает количество и сумму одобренных выводов пользователя"""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
-    SELECT id FROM used_promocodes 
-    WHERE user_id = ? AND promocode = ?
-    ''', (user_id, promocode))
-    result = cursor.fetchone()
+    SELECT COUNT(*), SUM(amount) FROM withdraw_requests 
+    WHERE user_id = ? AND status = 'approved'
+    ''', (user_id,))
+    
+    row = cursor.fetchone()
     conn.close()
-    return result is not None
+    
+    return {
+        'count': row[0] or 0,
+        'total_amount': row[1] or 0
+    }
 
-def mark_promo_as_used(user_id, promocode):
-    """Отмечает промокод как использованный"""
+def get_user_withdraw_history(user_id, limit=10):
+    """Получает последние заявки на вывод пользователя"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(SQL_USER_WITHDRAW_HISTORY, (user_id, limit))
+    
+    rows = cursor.fetchall()
+    conn.close()
+    return [tuple(row) for row in rows]
+
+# ========== ПРОМОКОДЫ ==========
+
+def add_promocode(code, reward, max_uses, created_by=None):
+    """Создает промокод. max_uses=None - без ограничения активаций.
+    Возвращает False, если такой промокод уже есть"""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
-    INSERT OR IGNORE INTO used_promocodes (user_id, promocode) 
-    VALUES (?, ?)
-    ''', (user_id, promocode))
+    INSERT OR IGNORE INTO promocodes (code, reward, max_uses, created_by) 
+    VALUES (?, ?, ?, ?)
+    ''', (code, reward, max_uses, created_by))
+    created = cursor.rowcount > 0
     conn.commit()
     conn.close()
+    return created
 
-def get_user_by_id_or_username(identifier):
-    """Находит пользователя по ID или username"""
+def get_all_promocodes():
+    """Получает все промокоды"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM promocodes ORDER BY created_at')
+    rows = cursor.fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_promocode(code):
+    """Получает промокод по названию"""
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute('SELECT * FROM promocodes WHERE code = ?', (code,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if row:
+        return dict(row)
+    return None
+
+def get_promo_claimers(code):
+    """Получает множество пользователей, уже активировавших промокод"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(SQL_PROMO_CLAIMERS, (code,))
+    rows = cursor.fetchall()
+    conn.close()
+    return {row[0] for row in rows}
+
+def commit_promo_claims(claims):
+    """Записывает пачку активаций [(user_id, код, награда), ...] одной транзакцией:
+    отметки об активации, счетчики промокодов и награды на балансы.
+    Каждая активация проходит под своей точкой сохранения: счетчик промокода
+    увеличивается только пока он активен и не исчерпан, а повторная активация
+    тем же пользователем не записывается. Отклоненная или упавшая активация
+    откатывается одна, не задевая остальные.
+    Возвращает список [True/False, ...] - записана ли каждая активация"""
+    results = []
     
+    with transaction() as conn:
+        for user_id, code, reward in claims:
+            conn.execute('SAVEPOINT promo_claim')
+            try:
+                written = (
+                    conn.execute('''
+                    INSERT OR IGNORE INTO used_promocodes (user_id, promocode) 
+                    VALUES (?, ?)
+                    ''', (user_id, code)).rowcount > 0
+                    and conn.execute('''
+                    UPDATE promocodes 
+                    SET used = used + 1 
+                    WHERE code = ? AND active = 1 AND (max_uses IS NULL OR used < max_uses)
+                    ''', (code,)).rowcount > 0
+                    and conn.execute('''
+                    UPDATE users 
+                    SET stars_balance = stars_balance + ?, last_active = CURRENT_TIMESTAMP 
+                    WHERE user_id = ?
+                    ''', (reward, user_id)).rowcount > 0
+                )
+            except sqlite3.Error as e:
+                print(f"❌ Ошибка активации промокода {code} пользователем {user_id}: {e}")
+                written = False
+            
+            if written:
+                conn.execute('RELEASE promo_claim')
+            else:
+                conn.execute('ROLLBACK TO promo_claim')
+                conn.execute('RELEASE promo_claim')
+            results.append(written)
+    
+    _profile_cache.invalidate(*(user_id for (user_id, code, reward), written in zip(claims, results) if written))
+    return results
+
+def get_user_by_id_or_username(identifier):
+    """Находит пользователя по ID или username"""
     if identifier.isdigit():
-        cursor.execute('SELECT * FROM users WHERE user_id = ?', (int(identifier),))
-    else:
-        username = identifier.lstrip('@')
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
+        # Профиль содержит все колонки users, так что можно взять его из кэша
+        return get_user_profile(int(identifier))
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    username = identifier.lstrip('@')
+    cursor.execute(SQL_USER_BY_USERNAME, (username,))
     
     row = cursor.fetchone()
     conn.close()
@@ -442,6 +1051,8 @@ def update_user_balance_by_admin(user_id, amount, operation_type):
     
     conn.commit()
     conn.close()
+    
+    _profile_cache.invalidate(user_id)
     return new_balance
 
 def get_total_lost():
@@ -461,15 +1072,167 @@ def get_total_lost():
     return result[0] or 0
 
 def add_game_stat(user_id, game_type, bet_amount, win_amount, net_result):
-    """Добавляет статистику игры"""
+    """Добавляет статистику игры (через буфер отложенной записи)"""
+    _write_behind.add_game_stat(user_id, game_type, bet_amount, win_amount, net_result)
+
+# ========== НЕЗАВЕРШЕННЫЕ ИГРЫ ==========
+# Состояние игры пишется в базу при каждом изменении, а списание ставки
+# и расчет делаются в той же транзакции, что и запись/удаление игры.
+# Деньги двигаются, только если строка игры еще была на месте,
+# поэтому повторный расчет той же игры ничего не начисляет
+
+SQL_SAVE_ACTIVE_GAME = '''
+    INSERT OR REPLACE INTO active_games (kind, user_id, state, updated_at) 
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+'''
+SQL_UPDATE_ACTIVE_GAME = '''
+    UPDATE active_games SET state = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE kind = ? AND user_id = ?
+'''
+SQL_DELETE_ACTIVE_GAME = 'DELETE FROM active_games WHERE kind = ? AND user_id = ?'
+SQL_FINISH_ACTIVE_GAME = 'DELETE FROM active_games WHERE kind = ? AND user_id = ? RETURNING user_id'
+
+def save_active_game(kind, user_id, state):
+    """Сохраняет состояние незавершенной игры (строка в компактном JSON)"""
+    with transaction() as conn:
+        conn.execute(SQL_SAVE_ACTIVE_GAME, (kind, user_id, state))
+
+def update_active_game(kind, user_id, state):
+    """Обновляет состояние игры, только если ее строка еще есть:
+    запоздавшее сохранение не вернет уже рассчитанную игру.
+    Возвращает False, если игры в базе уже нет"""
+    with transaction() as conn:
+        return conn.execute(SQL_UPDATE_ACTIVE_GAME, (state, kind, user_id)).rowcount > 0
+
+def delete_active_game(kind, user_id):
+    """Удаляет завершенную игру"""
+    with transaction() as conn:
+        conn.execute(SQL_DELETE_ACTIVE_GAME, (kind, user_id))
+
+def has_active_game(kind, user_id):
+    """Есть ли в базе незавершенная игра пользователя"""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-    INSERT INTO game_stats (user_id, game_type, bet_amount, win_amount, net_result)
-    VALUES (?, ?, ?, ?, ?)
-    ''', (user_id, game_type, bet_amount, win_amount, net_result))
-    conn.commit()
+    cursor.execute('SELECT 1 FROM active_games WHERE kind = ? AND user_id = ?', (kind, user_id))
+    result = cursor.fetchone()
     conn.close()
+    return result is not None
+
+def load_active_games():
+    """Получает все незавершенные игры: [(вид, user_id, состояние), ...]"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT kind, user_id, state FROM active_games')
+    rows = cursor.fetchall()
+    conn.close()
+    return [tuple(row) for row in rows]
+
+def reserve_bet(user_id, amount, game=None):
+    """Списывает ставку, если на балансе хватает средств.
+    game=(вид, состояние) - сохранить начатую игру в той же транзакции.
+    Возвращает новый баланс или None, если средств недостаточно"""
+    with transaction() as conn:
+        row = conn.execute('''
+        UPDATE users 
+        SET stars_balance = stars_balance - ?, last_active = CURRENT_TIMESTAMP 
+        WHERE user_id = ? AND stars_balance >= ?
+        RETURNING stars_balance
+        ''', (amount, user_id, amount)).fetchone()
+        if row is not None and game is not None:
+            conn.execute(SQL_SAVE_ACTIVE_GAME, (game[0], user_id, game[1]))
+    
+    if row is None:
+        return None
+    
+    _profile_cache.invalidate(user_id)
+    return row[0]
+
+# Списание ставки и начисление выигрыша одним запросом, только если хватает средств
+SQL_SETTLE_BET = '''
+    UPDATE users 
+    SET stars_balance = stars_balance - ? + ?, 
+        total_games = total_games + 1, 
+        last_active = CURRENT_TIMESTAMP 
+    WHERE user_id = ? AND stars_balance >= ?
+    RETURNING stars_balance, total_games
+'''
+
+def settle_bet(user_id, game_type, bet, win, already_debited=False, lines=None, finish_game=None):
+    """Рассчитывает ставку одной транзакцией: списывает ставку, начисляет выигрыш
+    и увеличивает счетчик игр. Статистика раунда уходит в буфер отложенной записи.
+    already_debited=True - ставка уже списана через reserve_bet.
+    lines - разбивка раунда на отдельные ставки [(ставка, выигрыш), ...].
+    finish_game - вид незавершенной игры, которую нужно удалить в той же транзакции;
+    если ее строки уже нет, игра рассчитана раньше и деньги не двигаются.
+    Возвращает новый баланс или None, если пользователя нет, не хватает средств
+    или игра уже рассчитана"""
+    debit = 0 if already_debited else bet
+    
+    with transaction() as conn:
+        if finish_game is not None and conn.execute(SQL_FINISH_ACTIVE_GAME, (finish_game, user_id)).fetchone() is None:
+            return None
+        row = conn.execute(SQL_SETTLE_BET, (debit, win, user_id, debit)).fetchone()
+    
+    if row is None:
+        return None
+    
+    _profile_cache.invalidate(user_id)
+    
+    # Деньги уже зафиксированы, строки статистики пишутся пачкой вместе с другими играми
+    _write_behind.add_game_stats([
+        (user_id, game_type, line_bet, line_win, line_win - line_bet)
+        for line_bet, line_win in (lines or [(bet, win)])
+    ])
+    
+    return row[0]
+
+def refund_bet(user_id, amount, finish_game=None):
+    """Возвращает списанную ставку и удаляет незавершенную игру одной транзакцией.
+    Если строки игры уже нет, игра рассчитана раньше и ставка не возвращается"""
+    with transaction() as conn:
+        if finish_game is not None and conn.execute(SQL_FINISH_ACTIVE_GAME, (finish_game, user_id)).fetchone() is None:
+            return None
+        row = conn.execute('''
+        UPDATE users 
+        SET stars_balance = stars_balance + ?, last_active = CURRENT_TIMESTAMP 
+        WHERE user_id = ?
+        RETURNING stars_balance
+        ''', (amount, user_id)).fetchone()
+    
+    if row is None:
+        return None
+    
+    _profile_cache.invalidate(user_id)
+    return row[0]
+
+def settle_bets(rounds):
+    """Рассчитывает ставки многих игроков одной транзакцией (общий стол рулетки).
+    rounds - [(user_id, game_type, ставка, выигрыш, lines), ...].
+    Возвращает {user_id: новый баланс или None, если не хватило средств}"""
+    settled = {}
+    
+    with transaction() as conn:
+        for user_id, game_type, bet, win, lines in rounds:
+            settled[user_id] = conn.execute(SQL_SETTLE_BET, (bet, win, user_id, bet)).fetchone()
+    
+    balances = {}
+    stats = []
+    for user_id, game_type, bet, win, lines in rounds:
+        row = settled[user_id]
+        if row is None:
+            balances[user_id] = None
+            continue
+        balances[user_id] = row[0]
+        _profile_cache.invalidate(user_id)
+        stats.extend(
+            (user_id, game_type, line_bet, line_win, line_win - line_bet)
+            for line_bet, line_win in (lines or [(bet, win)])
+        )
+    
+    if stats:
+        _write_behind.add_game_stats(stats)
+    
+    return balances
 
 def get_all_users_stats():
     """Получает статистику по всем пользователям"""
@@ -498,11 +1261,7 @@ def get_active_users_count(days=7):
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT COUNT(*) as active_users
-    FROM users 
-    WHERE last_active >= datetime('now', ?)
-    ''', (f'-{days} days',))
+    cursor.execute(SQL_ACTIVE_USERS_COUNT, (f'-{days} days',))
     
     result = cursor.fetchone()
     conn.close()
@@ -514,11 +1273,7 @@ def get_today_registrations():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT COUNT(*) as today_reg
-    FROM users 
-    WHERE DATE(registered_at) = DATE('now')
-    ''')
+    cursor.execute(SQL_TODAY_REGISTRATIONS)
     
     result = cursor.fetchone()
     conn.close()
@@ -530,13 +1285,7 @@ def get_pending_withdraws():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT 
-        COUNT(*) as count,
-        SUM(amount) as total_amount
-    FROM withdraw_requests 
-    WHERE status = 'pending'
-    ''')
+    cursor.execute(SQL_PENDING_WITHDRAWS)
     
     row = cursor.fetchone()
     conn.close()
@@ -558,16 +1307,8 @@ def check_user_exists(user_id):
     return not is_user_new(user_id)
 
 def update_user_last_active(user_id):
-    """Обновляет время последней активности"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-    UPDATE users 
-    SET last_active = CURRENT_TIMESTAMP 
-    WHERE user_id = ?
-    ''', (user_id,))
-    conn.commit()
-    conn.close()
+    """Обновляет время последней активности (через буфер отложенной записи)"""
+    _write_behind.touch(user_id)
 
 def get_all_users():
     """Получает всех пользователей"""
@@ -587,8 +1328,35 @@ def delete_user(user_id):
     cursor.execute('DELETE FROM withdraw_requests WHERE user_id = ?', (user_id,))
     cursor.execute('DELETE FROM game_stats WHERE user_id = ?', (user_id,))
     cursor.execute('DELETE FROM bans WHERE user_id = ?', (user_id,))
+    cursor.execute('DELETE FROM active_games WHERE user_id = ?', (user_id,))
+    conn.commit()
+    conn.close()
+    
+    _forget_ban(user_id)
+    _profile_cache.invalidate(user_id)
+
+def purge_user_data(user_id):
+    """Удаляет все записи пользователя из всех таблиц с колонкой user_id"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = cursor.fetchall()
+    
+    for table in tables:
+        table_name = table[0]
+        if table_name not in ['sqlite_sequence', 'sqlite_master']:
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            columns = [col[1] for col in cursor.fetchall()]
+            
+            if 'user_id' in columns:
+                cursor.execute(f'DELETE FROM {table_name} WHERE user_id = ?', (user_id,))
+    
     conn.commit()
     conn.close()
+    
+    _forget_ban(user_id)
+    _profile_cache.invalidate(user_id)
 
 def reset_user_stats(user_id):
     """Сбрасывает статистику пользователя"""
@@ -605,22 +1373,14 @@ def reset_user_stats(user_id):
     ''', (user_id,))
     conn.commit()
     conn.close()
+    
+    _profile_cache.invalidate(user_id)
 
 def get_user_game_stats(user_id):
     """Получает статистику игр пользователя"""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-    SELECT 
-        game_type,
-        COUNT(*) as games_played,
-        SUM(bet_amount) as total_bet,
-        SUM(win_amount) as total_win,
-        SUM(net_result) as total_profit
-    FROM game_stats 
-    WHERE user_id = ?
-    GROUP BY game_type
-    ''', (user_id,))
+    cursor.execute(SQL_USER_GAME_STATS, (user_id,))
     
     rows = cursor.fetchall()
     conn.close()
@@ -658,11 +1418,70 @@ def get_top_users_by_games(limit=10):
 
 def backup_database(backup_file='casino_bot_backup.db'):
     """Создает резервную копию базы данных"""
-    import shutil
     try:
-        shutil.copy2(DB_NAME, backup_file)
+        # В режиме WAL часть данных лежит в -wal файле, поэтому копируем
+        # через backup API, а не копированием файла
+        conn = get_db_connection()
+        backup_conn = sqlite3.connect(backup_file)
+        try:
+            conn.backup(backup_conn)
+        finally:
+            backup_conn.close()
+            conn.close()
         print(f"✅ Резервная копия создана: {backup_file}")
         return True
     except Exception as e:
         print(f"❌ Ошибка создания резервной копии: {e}")
-        return False
\ No newline at end of file
+        return False
+
+# ========== АСИНХРОННЫЕ ВЕРСИИ ДЛЯ ОБРАБОТЧИКОВ ==========
+
+is_user_new_async = _make_async(is_user_new)
+register_user_async = _make_async(register_user)
+update_user_balance_async = _make_async(update_user_balance)
+get_user_profile_async = _make_async(get_user_profile)
+update_user_deposit_async = _make_async(update_user_deposit)
+update_user_withdraw_async = _make_async(update_user_withdraw)
+update_user_games_count_async = _make_async(update_user_games_count)
+ban_user_async = _make_async(ban_user)
+unban_user_async = _make_async(unban_user)
+get_all_banned_users_async = _make_async(get_all_banned_users)
+search_user_by_name_async = _make_async(search_user_by_name)
+create_withdraw_request_async = _make_async(create_withdraw_request)
+get_withdraw_request_async = _make_async(get_withdraw_request)
+update_withdraw_request_async = _make_async(update_withdraw_request)
+get_user_withdraw_summary_async = _make_async(get_user_withdraw_summary)
+get_user_withdraw_history_async = _make_async(get_user_withdraw_history)
+get_user_by_id_or_username_async = _make_async(get_user_by_id_or_username)
+add_promocode_async = _make_async(add_promocode)
+get_all_promocodes_async = _make_async(get_all_promocodes)
+get_promocode_async = _make_async(get_promocode)
+get_promo_claimers_async = _make_async(get_promo_claimers)
+update_user_balance_by_admin_async = _make_async(update_user_balance_by_admin)
+get_total_lost_async = _make_async(get_total_lost)
+add_game_stat_async = _make_async(add_game_stat)
+reserve_bet_async = _make_async(reserve_bet)
+settle_bet_async = _make_async(settle_bet)
+settle_bets_async = _make_async(settle_bets)
+refund_bet_async = _make_async(refund_bet)
+save_active_game_async = _make_async(save_active_game)
+update_active_game_async = _make_async(update_active_game)
+has_active_game_async = _make_async(has_active_game)
+delete_active_game_async = _make_async(delete_active_game)
+load_active_games_async = _make_async(load_active_games)
+get_all_users_stats_async = _make_async(get_all_users_stats)
+get_active_users_count_async = _make_async(get_active_users_count)
+get_today_registrations_async = _make_async(get_today_registrations)
+get_pending_withdraws_async = _make_async(get_pending_withdraws)
+get_user_balance_async = _make_async(get_user_balance)
+check_user_exists_async = _make_async(check_user_exists)
+update_user_last_active_async = _make_async(update_user_last_active)
+get_all_users_async = _make_async(get_all_users)
+delete_user_async = _make_async(delete_user)
+purge_user_data_async = _make_async(purge_user_data)
+reset_user_stats_async = _make_async(reset_user_stats)
+get_user_game_stats_async = _make_async(get_user_game_stats)
+get_top_users_by_balance_async = _make_async(get_top_users_by_balance)
+get_top_users_by_games_async = _make_async(get_top_users_by_games)
+get_schema_version_async = _make_async(get_schema_version)
+backup_database_async = _make_async(backup_database)
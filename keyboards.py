@@ -1,43 +1,61 @@
 # keyboards.py
+import functools
 from aiogram.types import (
     ReplyKeyboardMarkup, KeyboardButton,
     InlineKeyboardMarkup, InlineKeyboardButton
 )
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+# Одинаковые клавиатуры собираются один раз при загрузке модуля, а функции
+# create_* возвращают общий объект. Клавиатуры с id собираются фабриками с кэшем.
+# Объекты клавиатур aiogram изменяемые (MutableTelegramObject), а здесь один
+# объект отдается всем обработчикам: менять возвращенную клавиатуру, ее ряды
+# и кнопки нельзя. Нужна другая клавиатура - соберите новую
+KEYBOARD_CACHE_SIZE = 1024
+
 # Главное меню пользователя (вариант 1-2-3)
+MENU_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="👤 Профиль")],  # Одна кнопка в строке
+        [KeyboardButton(text="🎟️ Промокод"), KeyboardButton(text="🎮 Игры")],  # Две кнопки
+        [KeyboardButton(text="ℹ️ О нас"), KeyboardButton(text="🆘 Поддержка"), KeyboardButton(text="📖 Как играть?")]  # Три кнопки
+    ],
+    resize_keyboard=True
+)
+
 def create_menu_keyboard():
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="👤 Профиль")],  # Одна кнопка в строке
-            [KeyboardButton(text="🎟️ Промокод"), KeyboardButton(text="🎮 Игры")],  # Две кнопки
-            [KeyboardButton(text="ℹ️ О нас"), KeyboardButton(text="🆘 Поддержка"), KeyboardButton(text="📖 Как играть?")]  # Три кнопки
-        ],
-        resize_keyboard=True
-    )
+    """Общая клавиатура главного меню, не менять"""
+    return MENU_KEYBOARD
 
 # Клавиатура профиля
+_profile_builder = InlineKeyboardBuilder()
+_profile_builder.row(
+    InlineKeyboardButton(text="💎 Пополнить", callback_data="deposit"),
+    InlineKeyboardButton(text="💰 Вывод", callback_data="withdraw")
+)
+PROFILE_KEYBOARD = _profile_builder.as_markup()
+
 def create_profile_keyboard():
-    builder = InlineKeyboardBuilder()
-    builder.row(
-        InlineKeyboardButton(text="💎 Пополнить", callback_data="deposit"),
-        InlineKeyboardButton(text="💰 Вывод", callback_data="withdraw")
-    )
-    return builder.as_markup()
+    return PROFILE_KEYBOARD
 
 # Клавиатура для промокода
+PROMO_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_promo")]
+])
+
 def create_promo_keyboard():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_promo")]
-    ])
+    return PROMO_KEYBOARD
 
 # Клавиатура для вывода
+WITHDRAW_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_withdraw")]
+])
+
 def create_withdraw_keyboard():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_withdraw")]
-    ])
+    return WITHDRAW_KEYBOARD
 
-# Админ клавиатура для вывода
+# Админ клавиатура для вывода (из кэша, не менять)
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def create_withdraw_admin_keyboard(request_id):
     return InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -47,42 +65,48 @@ def create_withdraw_admin_keyboard(request_id):
     ])
 
 # Главная админ клавиатура
+ADMIN_MAIN_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="📊 Статистика", callback_data="admin_stats"),
+        InlineKeyboardButton(text="💰 Балансы", callback_data="admin_manage_balance")
+    ],
+    [
+        InlineKeyboardButton(text="🎫 Промокоды", callback_data="admin_promo_codes"),
+        InlineKeyboardButton(text="👤 Просмотр профиля", callback_data="admin_view_profile")
+    ]
+])
+
 def create_admin_main_keyboard():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="📊 Статистика", callback_data="admin_stats"),
-            InlineKeyboardButton(text="💰 Балансы", callback_data="admin_manage_balance")
-        ],
-        [
-            InlineKeyboardButton(text="🎫 Промокоды", callback_data="admin_promo_codes"),
-            InlineKeyboardButton(text="👤 Просмотр профиля", callback_data="admin_view_profile")
-        ]
-    ])
+    return ADMIN_MAIN_KEYBOARD
 
 # Админ клавиатура управления балансом
+ADMIN_MANAGE_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="💎 Выдать", callback_data="admin_add_balance"),
+        InlineKeyboardButton(text="📉 Забрать", callback_data="admin_subtract_balance")
+    ],
+    [
+        InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back_to_main")
+    ]
+])
+
 def create_admin_manage_keyboard():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="💎 Выдать", callback_data="admin_add_balance"),
-            InlineKeyboardButton(text="📉 Забрать", callback_data="admin_subtract_balance")
-        ],
-        [
-            InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back_to_main")
-        ]
-    ])
+    return ADMIN_MANAGE_KEYBOARD
 
 # Админ клавиатура назад
-def create_admin_back_keyboard():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back_to_main")]
-    ])
+ADMIN_BACK_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back_to_main")]
+])
 
-# keyboards.py (обновляем функцию)
+def create_admin_back_keyboard():
+    return ADMIN_BACK_KEYBOARD
 
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def create_admin_profile_actions_keyboard(user_id, is_banned=False):
     """
     Создает клавиатуру для действий с профилем
     is_banned: True если пользователь забанен
+    Клавиатура берется из кэша и общая для всех вызовов, менять ее нельзя
     """
     if is_banned:
         # Если забанен - показываем кнопку разбанить
@@ -115,7 +139,8 @@ def create_admin_profile_actions_keyboard(user_id, is_banned=False):
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-# Добавляем клавиатуру для подтверждения бана
+# Добавляем клавиатуру для подтверждения бана (из кэша, не менять)
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def create_ban_confirmation_keyboard(user_id):
     return InlineKeyboardMarkup(inline_keyboard=[
         [
@@ -124,7 +149,8 @@ def create_ban_confirmation_keyboard(user_id):
         ]
     ])
 
-# Добавляем клавиатуру для подтверждения разбана
+# Добавляем клавиатуру для подтверждения разбана (из кэша, не менять)
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def create_unban_confirmation_keyboard(user_id):
     return InlineKeyboardMarkup(inline_keyboard=[
         [
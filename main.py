@@ -1,23 +1,31 @@
 # main.py
-import json
-from ruletka import handle_roulette_game
-import os
-from aiogram import Bot, Dispatcher, types, F
+from ruletka import handle_roulette_game, restore_roulette_game
+from aiogram import Bot, Dispatcher, F
 from aiogram.filters import Command
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, LabeledPrice, CallbackQuery, PreCheckoutQuery
+from aiogram.types import Message, InlineKeyboardButton, LabeledPrice, CallbackQuery, PreCheckoutQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 import asyncio
-from database import get_ban_info, is_user_banned
 import random
+import json
 from datetime import datetime
 import logging
 from database import *
 from keyboards import *
 from admin import *
+from middlewares import BanMiddleware, ThrottlingMiddleware, THROTTLE_PROMO_STATES
+from animations import animator
+from outbound import outbound, OutboundMiddleware, PRIORITY_HIGH, priority, set_priority
+from promo import promo_engine, PROMO_ALREADY_USED, PROMO_INVALID
+from reaper import reaper
+from routing import (
+    text_router, Route, ROUTE_ADMIN_PLUS, ROUTE_COLOR, ROUTE_DICE, ROUTE_MINES,
+    ROUTE_PURGE, ROUTE_ROULETTE, ROUTE_ROULETTE_BET
+)
+from mines import MinesGame, get_variant, MINES_COUNT, MINES_GRID_RANGE, MINES_GRID_SIZE, MINES_MAX_COUNT
 
 # Настраиваем логгирование
 logging.basicConfig(
@@ -35,185 +43,37 @@ bot = Bot(
 )
 dp = Dispatcher()
 
-# Файл для хранения промокодов
-PROMO_FILE = "promo.json"
-
-# Загружаем промокоды из файла
-def load_promo_codes():
-    if os.path.exists(PROMO_FILE):
-        try:
-            with open(PROMO_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-# Сохраняем промокоды в файл
-def save_promo_codes():
-    with open(PROMO_FILE, 'w', encoding='utf-8') as f:
-        json.dump(PROMO_CODES, f, ensure_ascii=False, indent=2)
+# Все исходящие запросы в чаты идут через очередь с лимитами Telegram
+bot.session.middleware(OutboundMiddleware(outbound))
 
-# Инициализируем промокоды
-PROMO_CODES = load_promo_codes()
+# Проверка бана один раз на обновление, до выбора обработчика по фильтрам
+ban_middleware = BanMiddleware()
+dp.update.outer_middleware(ban_middleware)
 
 class Form(StatesGroup):
     waiting_for_promo = State()
     waiting_for_withdraw_amount = State()
     waiting_for_deposit_amount = State()
 
-active_mines_games = {}
-
-class MinesGame:
-    def __init__(self, user_id, bet_amount):
-        self.user_id = user_id
-        self.bet_amount = bet_amount
-        self.grid_size = 5
-        self.mines_count = 6
-        self.opened_cells = 0
-        self.multiplier = 1.00
-        self.game_over = False
-        self.game_won = False
-        self.current_multiplier = 1.00
-        self.opened_positions = set()
-        self.mine_positions = set()
-        self.generate_field()
-        self.start_time = datetime.now()
-    
-    def generate_field(self):
-        all_positions = [(i, j) for i in range(self.grid_size) for j in range(self.grid_size)]
-        self.mine_positions = set(random.sample(all_positions, self.mines_count))
-    
-    def open_cell(self, x, y):
-        position = (x, y)
-        
-        if position in self.opened_positions:
-            return None
-        
-        if position in self.mine_positions:
-            self.game_over = True
-            self.game_won = False
-            return 'mine'
-        
-        self.opened_positions.add(position)
-        self.opened_cells += 1
-        self.multiplier += 0.35
-        self.current_multiplier = round(self.multiplier, 2)
-        
-        safe_cells = (self.grid_size * self.grid_size) - self.mines_count
-        if self.opened_cells == safe_cells:
-            self.game_over = True
-            self.game_won = True
-            win_amount = int(self.bet_amount * self.current_multiplier)
-            return 'win', win_amount
-        
-        return 'safe'
-    
-    def get_win_amount(self):
-        return int(self.bet_amount * self.current_multiplier)
-    
-    def get_field_display(self, show_mines=False):
-        buttons = []
-        
-        for i in range(self.grid_size):
-            row_buttons = []
-            for j in range(self.grid_size):
-                position = (i, j)
-                if position in self.opened_positions:
-                    if position in self.mine_positions and (show_mines or self.game_over):
-                        row_buttons.append(InlineKeyboardButton(text="💣", callback_data=f"mines_opened_{i}_{j}"))
-                    else:
-                        row_buttons.append(InlineKeyboardButton(text="✅", callback_data=f"mines_opened_{i}_{j}"))
-                else:
-                    row_buttons.append(InlineKeyboardButton(text="❓", callback_data=f"mines_open_{i}_{j}"))
-            buttons.append(row_buttons)
-        
-        if self.opened_cells > 0:
-            buttons.append([InlineKeyboardButton(text="💎 Забрать выигрыш", callback_data="mines_cashout")])
-        else:
-            buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="mines_cancel")])
-        
-        return InlineKeyboardMarkup(inline_keyboard=buttons)
-    
-    def get_game_message(self):
-        username = get_user_profile(self.user_id)['first_name'] if get_user_profile(self.user_id) else "Игрок"
-        
-        if self.game_over:
-            if self.game_won:
-                win_amount = self.get_win_amount()
-                return f"""🎮 Игра завершена!
-
-<b>{username}</b>, поздравляем с победой! 🎉
-
-💰 <b>Ставка:</b> {self.bet_amount} ⭐
-📈 <b>Множитель:</b> x{self.current_multiplier}
-🏆 <b>Выигрыш:</b> {win_amount} ⭐
-
-Все мины успешно обойдены! ✅"""
-            else:
-                return f"""💥 Игра завершена!
-
-<b>{username}</b>, вы наткнулись на мину! 💣
-
-💰 <b>Ставка:</b> {self.bet_amount} ⭐
-😔 <b>Результат:</b> Проигрыш
-
-Попробуйте еще раз! 🍀"""
-        else:
-            safe_cells = (self.grid_size * self.grid_size) - self.mines_count
-            return f"""🎮 {username}, вы начали игру Минное поле!
-
-💰 <b>Ставка:</b> {self.bet_amount} ⭐
-📈 <b>Текущий множитель:</b> x{self.current_multiplier}
-💵 <b>Выигрыш:</b> x{self.current_multiplier} | {int(self.bet_amount * self.current_multiplier)} ⭐"""
-
-# ========== ФУНКЦИЯ ДЛЯ ПРОВЕРКИ БАНОВ ==========
-
-def check_user_ban(user_id: int, event=None) -> bool:
-    """Проверяет, забанен ли пользователь. Если event передан, показывает сообщение.
-    Возвращает True если пользователь забанен, False если нет."""
-    if user_id == ADMIN_ID:
-        return False
-    
-    if is_user_banned(user_id):
-        ban_info = get_ban_info(user_id)
-        if ban_info:
-            try:
-                ban_date = datetime.strptime(ban_info['banned_at'], '%Y-%m-%d %H:%M:%S')
-                formatted_date = ban_date.strftime('%d.%m.%Y %H:%M')
-            except:
-                formatted_date = "Неизвестно"
-            
-            ban_text = f"""<b>🚫 Вы забанены!</b>
-
-<b>❌ Причина:</b> {ban_info['reason']}
-<b>📅 Дата бана:</b> {formatted_date}
+# Маршрут текста определяется один раз: его используют троттлинг и фильтры Route
+dp.update.outer_middleware(text_router)
 
-<b>⚠️ Вы не можете использовать бота.</b>
+# Ограничение частоты команд: после проверки бана, до выбора обработчика
+THROTTLE_PROMO_STATES.add(Form.waiting_for_promo.state)
+dp.update.outer_middleware(ThrottlingMiddleware())
 
-<b>📞 Поддержка:</b> @whArcana"""
-            
-            if event:
-                if isinstance(event, CallbackQuery):
-                    asyncio.create_task(event.answer(ban_text, show_alert=True))
-                elif isinstance(event, Message):
-                    asyncio.create_task(event.answer(ban_text))
-        return True
-    return False
+active_mines_games = {}  # user_id -> MinesGame
 
 # ========== ОБРАБОТЧИКИ КОМАНД ==========
 
 @dp.message(Command("start"))
 async def cmd_start(message: Message, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     await state.clear()
     
     user = message.from_user
     
-    if is_user_new(user.id):
-        register_user(user.id, user.username, user.first_name)
+    if await is_user_new_async(user.id):
+        await register_user_async(user.id, user.username, user.first_name)
         
         welcome_text = """<blockquote><b>👋🏻 Добро пожаловать в ArcanaCasino!</b></blockquote>
 
@@ -236,20 +96,12 @@ async def cmd_start(message: Message, state: FSMContext):
 
 @dp.message(Command("menu"))
 async def cmd_menu(message: Message, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     await state.clear()
     menu_text = "<b>Меню находится по кнопкам ниже:</b>"
     await message.answer(menu_text, reply_markup=create_menu_keyboard())
 
 @dp.message(Command("cancel"))
 async def cmd_cancel(message: Message, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     current_state = await state.get_state()
     
     if current_state is None:
@@ -267,12 +119,8 @@ async def cmd_cancel(message: Message, state: FSMContext):
     await state.clear()
     await message.answer(f"✅ <b>{state_name.capitalize()} отменено</b>", reply_markup=create_menu_keyboard())
 
-@dp.message(lambda message: message.text and message.text.lower().startswith(('рулетка', 'roulette', 'рул', 'рлт')))
+@dp.message(Route(ROUTE_ROULETTE))
 async def handle_roulette_command(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     await handle_roulette_game(bot, message, dp)
 
 @dp.message(Command("admin"))
@@ -297,12 +145,8 @@ async def cmd_admin(message: Message):
 
 @dp.message(F.text == "👤 Профиль")
 async def show_profile(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     user = message.from_user
-    profile_data = get_user_profile(user.id)
+    profile_data = await get_user_profile_async(user.id)
     
     if profile_data:
         try:
@@ -344,10 +188,6 @@ async def show_profile(message: Message):
 
 @dp.message(F.text == "🎟️ Промокод")
 async def show_promocode(message: Message, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     promo_text = """<b>🎟️ Активация промокода</b>
 
 <code>✏️ Введите промокод:</code>
@@ -359,10 +199,6 @@ async def show_promocode(message: Message, state: FSMContext):
 
 @dp.message(F.text == "🎮 Игры")
 async def show_games(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     games_text = """<b>🎮 ИГРЫ</b>
 <blockquote><b>🎲 КУБИК</b>
 └ Ставь и выигрывай ×2
@@ -370,7 +206,7 @@ async def show_games(message: Message):
 
 <b>💰 МИНЫ</b>
 └ Обходи мины и увеличивай множитель
-<b>Формат:</b> мины [ставка]
+<b>Формат:</b> мины [ставка] [мины] [поле]
 
 <b>🎡 ЦВЕТА</b>  
 └ Угадай цвет и получи выигрыш 
@@ -386,10 +222,6 @@ async def show_games(message: Message):
 
 @dp.message(F.text == "ℹ️ О нас")
 async def show_about(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     about_text = """<b>ℹ️ О нас:</b>
 
 Проект занимающийся раздачами а также разработкой игр
@@ -413,10 +245,6 @@ async def show_about(message: Message):
 
 @dp.message(F.text == "🆘 Поддержка")
 async def show_support(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     support_text = """<b>🆘 Поддержка</b>
 
 • <b>Техническая поддержка:</b> @whArcana
@@ -430,10 +258,6 @@ async def show_support(message: Message):
 
 @dp.message(F.text == "📖 Как играть?")
 async def show_how_to_play(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     how_to_play_text = """<b>📖 Информация для игроков:</b>
 
 <blockquote><b>🎲 Кубик</b>
@@ -466,30 +290,18 @@ async def show_how_to_play(message: Message):
 
 @dp.callback_query(F.data == "cancel_promo")
 async def cancel_promo_callback(callback: CallbackQuery, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(callback.from_user.id, callback):
-        return
-    
     await state.clear()
     await callback.message.edit_text("✅ <b>Ввод промокода отменен</b>")
     await callback.answer()
 
 @dp.message(Form.waiting_for_promo, F.text == "❌ Отмена")
 async def cancel_promo(message: Message, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     await state.clear()
     await message.answer("✅ <b>Ввод промокода отменен</b>", reply_markup=create_menu_keyboard())
 
 # Обработчик для создания промокода (должен быть ВЫШЕ общего обработчика)
-@dp.message(F.text.startswith('+'))
+@dp.message(Route(ROUTE_ADMIN_PLUS))
 async def create_promocode(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     # Проверяем права администратора (добавьте свою логику проверки)
     if not is_admin(message.from_user.id):
         return
@@ -507,23 +319,11 @@ async def create_promocode(message: Message):
         reward = int(parts[1])
         max_uses = int(parts[2])
         
-        # Проверяем, существует ли уже такой промокод
-        if promo_name in PROMO_CODES:
+        # Создаем новый промокод, если такого еще нет
+        if not await add_promocode_async(promo_name, reward, max_uses, message.from_user.id):
             await message.answer(f"❌ <b>Промокод {promo_name} уже существует!</b>")
             return
         
-        # Создаем новый промокод
-        PROMO_CODES[promo_name] = {
-            'reward': reward,
-            'max_uses': max_uses,
-            'used': 0,
-            'active': True,
-            'created_at': datetime.now().isoformat(),
-            'created_by': message.from_user.id
-        }
-        
-        save_promo_codes()  # Сохраняем в файл/БД
-        
         success_text = f"""✅ <b>Промокод создан успешно!</b>
 
 🎟️ <b>Название:</b> {promo_name}
@@ -540,10 +340,6 @@ async def create_promocode(message: Message):
 # Основной обработчик активации промокода
 @dp.message(Form.waiting_for_promo)
 async def activate_promocode(message: Message, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     user = message.from_user
     promo_code = message.text.strip().upper()
     
@@ -559,10 +355,16 @@ async def activate_promocode(message: Message, state: FSMContext):
     
     username = f"@{user.username}" if user.username else user.first_name
     
-    if (promo_code not in PROMO_CODES or 
-        not PROMO_CODES[promo_code].get('active', False) or 
-        (PROMO_CODES[promo_code].get('used', 0) >= PROMO_CODES[promo_code].get('max_uses', 0) and 
-         PROMO_CODES[promo_code].get('max_uses', 0) != float('inf'))):
+    # Активации одного промокода идут по очереди, лимит не будет превышен
+    try:
+        status, reward = await promo_engine.redeem(user.id, promo_code)
+    except Exception as e:
+        logger.error(f"Ошибка при активации промокода {promo_code}: {e}")
+        await message.answer("❌ <b>Произошла ошибка. Попробуйте позже.</b>")
+        await state.clear()
+        return
+    
+    if status == PROMO_INVALID:
         
         error_text = f"""<b>🎟️ Промокод • {username}</b>
 <blockquote>❌ Промокода нету либо не правильно написали либо исчерпан</blockquote>"""
@@ -571,7 +373,7 @@ async def activate_promocode(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    if has_user_used_promo(user.id, promo_code):
+    if status == PROMO_ALREADY_USED:
         error_text = f"""<b>🎟️ Промокод • {username}</b>
 <blockquote>❌ Вы уже использовали этот промокод ранее</blockquote>"""
         
@@ -579,16 +381,6 @@ async def activate_promocode(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    promo_info = PROMO_CODES[promo_code]
-    reward = promo_info.get('reward', 0)
-    
-    if reward > 0:
-        update_user_balance(user.id, reward)
-    
-    mark_promo_as_used(user.id, promo_code)
-    PROMO_CODES[promo_code]['used'] = PROMO_CODES[promo_code].get('used', 0) + 1
-    save_promo_codes()
-    
     success_text = f"""<b>🎟️ Промокод • {username}</b>
 <blockquote>✅ Вы успешно активировали промокод {promo_code}
 🏆 Награда: {reward} ⭐</blockquote>"""
@@ -600,10 +392,6 @@ async def activate_promocode(message: Message, state: FSMContext):
 
 @dp.callback_query(F.data == "deposit")
 async def deposit_callback(callback: CallbackQuery, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(callback.from_user.id, callback):
-        return
-    
     deposit_text = """<b>💎 Пополнение баланса</b>
 
 <b>💰 Курс:</b> 1 звезда Telegram = 1 звезда в боте
@@ -622,12 +410,8 @@ async def deposit_callback(callback: CallbackQuery, state: FSMContext):
 
 @dp.callback_query(F.data == "withdraw")
 async def withdraw_callback(callback: CallbackQuery, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(callback.from_user.id, callback):
-        return
-    
     user = callback.from_user
-    profile_data = get_user_profile(user.id)
+    profile_data = await get_user_profile_async(user.id)
     
     if profile_data['stars_balance'] < 150:
         await callback.answer("❌ Минимальная сумма для вывода - 150 ⭐", show_alert=True)
@@ -657,10 +441,6 @@ async def withdraw_callback(callback: CallbackQuery, state: FSMContext):
 
 @dp.callback_query(F.data == "cancel_withdraw")
 async def cancel_withdraw_callback(callback: CallbackQuery, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(callback.from_user.id, callback):
-        return
-    
     await state.clear()
     
     builder = InlineKeyboardBuilder()
@@ -677,23 +457,15 @@ async def cancel_withdraw_callback(callback: CallbackQuery, state: FSMContext):
 
 @dp.message(Form.waiting_for_withdraw_amount, F.text == "❌ Отмена")
 async def cancel_withdraw(message: Message, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     await state.clear()
     await message.answer("✅ <b>Вывод отменен</b>", reply_markup=create_menu_keyboard())
 
 @dp.message(Form.waiting_for_withdraw_amount)
 async def process_withdraw_amount(message: Message, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     try:
         amount = int(message.text)
         user = message.from_user
-        profile_data = get_user_profile(user.id)
+        profile_data = await get_user_profile_async(user.id)
         
         if amount < 150:
             await message.answer("❌ <b>Минимальная сумма для вывода - 150 ⭐</b>")
@@ -703,8 +475,14 @@ async def process_withdraw_amount(message: Message, state: FSMContext):
             await message.answer(f"❌ <b>У вас недостаточно средств. Ваш баланс: {profile_data['stars_balance']} ⭐</b>")
             return
         
-        update_user_balance(user.id, -amount)
-        request_id = create_withdraw_request(user.id, amount)
+        # Списание с проверкой баланса в том же запросе: параллельный вывод
+        # или ставка между проверкой и списанием не уведут баланс в минус
+        new_balance = await reserve_bet_async(user.id, amount)
+        if new_balance is None:
+            await message.answer("❌ <b>У вас недостаточно средств.</b>")
+            return
+        
+        request_id = await create_withdraw_request_async(user.id, amount)
         
         username = f"@{user.username}" if user.username else user.first_name
         current_time = datetime.now().strftime('%d.%m.%Y %H:%M')
@@ -717,17 +495,18 @@ async def process_withdraw_amount(message: Message, state: FSMContext):
 <b>📅 Дата:</b> {current_time}
 <b>📋 Номер заявки:</b> #{request_id}
 
-<b>💸 Баланс пользователя:</b> {profile_data['stars_balance'] - amount} ⭐"""
+<b>💸 Баланс пользователя:</b> {new_balance} ⭐"""
 
         try:
-            await bot.send_message(
-                ADMIN_ID,
-                admin_text,
-                reply_markup=create_withdraw_admin_keyboard(request_id)
-            )
+            with priority(PRIORITY_HIGH):
+                await bot.send_message(
+                    ADMIN_ID,
+                    admin_text,
+                    reply_markup=create_withdraw_admin_keyboard(request_id)
+                )
         except Exception as e:
             logger.error(f"Не удалось отправить сообщение админу: {e}")
-            update_user_balance(user.id, amount)
+            await update_user_balance_async(user.id, amount)
             await message.answer("❌ <b>Произошла ошибка при создании заявки. Попробуйте позже.</b>")
             await state.clear()
             return
@@ -756,10 +535,6 @@ async def process_withdraw_amount(message: Message, state: FSMContext):
 
 @dp.message(Form.waiting_for_deposit_amount)
 async def process_deposit_amount(message: Message, state: FSMContext):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     try:
         amount = int(message.text)
         
@@ -805,10 +580,6 @@ async def process_deposit_amount(message: Message, state: FSMContext):
 
 @dp.message(Form.waiting_for_deposit_amount)
 async def handle_unknown_in_deposit_state(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     if not message.text.isdigit():
         await message.answer("❌ <b>Пожалуйста, введите сумму для пополнения (только цифры) или используйте меню для отмена</b>")
     return
@@ -829,10 +600,6 @@ async def reject_withdraw_callback(callback: CallbackQuery):
 
 @dp.callback_query(F.data == "cancel_invoice")
 async def cancel_invoice(callback: CallbackQuery):
-    # Проверяем бан
-    if check_user_ban(callback.from_user.id, callback):
-        return
-    
     await callback.message.delete()
     await callback.answer("❌ Оплата отменена")
 
@@ -843,6 +610,8 @@ async def process_pre_checkout(pre_checkout_query: PreCheckoutQuery):
 
 @dp.message(F.successful_payment)
 async def process_successful_payment(message: Message):
+    # Ответы о зачислении платежа уходят раньше остальных
+    set_priority(PRIORITY_HIGH)
     logger.info("=" * 50)
     logger.info(f"💰 ПОЛУЧЕН УСПЕШНЫЙ ПЛАТЕЖ!")
     logger.info(f"От пользователя: {message.from_user.id} (@{message.from_user.username})")
@@ -865,21 +634,21 @@ async def process_successful_payment(message: Message):
             logger.info(f"   Amount: {amount} звезд")
             
             # Получаем текущие данные пользователя
-            profile_data = get_user_profile(user_id)
+            profile_data = await get_user_profile_async(user_id)
             if not profile_data:
                 logger.error(f"❌ Пользователь {user_id} не найден в базе!")
-                register_user(user_id, message.from_user.username, message.from_user.first_name)
-                profile_data = get_user_profile(user_id)
+                await register_user_async(user_id, message.from_user.username, message.from_user.first_name)
+                profile_data = await get_user_profile_async(user_id)
             
             old_balance = profile_data['stars_balance']
             logger.info(f"💰 Старый баланс: {old_balance} ⭐")
             
             # Обновляем баланс
-            update_user_balance(user_id, amount)
-            update_user_deposit(user_id, amount)
+            await update_user_balance_async(user_id, amount)
+            await update_user_deposit_async(user_id, amount)
             
             # Получаем обновленные данные
-            profile_data = get_user_profile(user_id)
+            profile_data = await get_user_profile_async(user_id)
             new_balance = profile_data['stars_balance']
             logger.info(f"💰 Новый баланс: {new_balance} ⭐")
             logger.info(f"✅ Баланс обновлен на +{amount} ⭐")
@@ -915,12 +684,8 @@ async def process_successful_payment(message: Message):
 @dp.message(Command("balance"))
 async def check_balance(message: Message):
     """Проверка баланса пользователя"""
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     user = message.from_user
-    profile_data = get_user_profile(user.id)
+    profile_data = await get_user_profile_async(user.id)
     
     if profile_data:
         balance_text = f"""<b>💰 Ваш баланс</b>
@@ -937,7 +702,7 @@ async def check_balance(message: Message):
 
 # ========== ПОЛНОЕ УДАЛЕНИЕ ДЛЯ АДМИНА ==========
 
-@dp.message(lambda message: message.from_user.id == 8476768340 and message.text and message.text.lower() == "обнул")
+@dp.message(Route(ROUTE_PURGE), F.from_user.id == 8476768340)
 async def admin_full_delete(message: Message):
     # Не проверяем бан для админа
     user_id = message.from_user.id
@@ -951,36 +716,14 @@ async def admin_full_delete(message: Message):
         except:
             pass
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
-        cursor.execute('DELETE FROM withdraw_requests WHERE user_id = ?', (user_id,))
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='used_promocodes'")
-        if cursor.fetchone():
-            cursor.execute('DELETE FROM used_promocodes WHERE user_id = ?', (user_id,))
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        
-        for table in tables:
-            table_name = table[0]
-            if table_name not in ['sqlite_sequence', 'sqlite_master']:
-                cursor.execute(f"PRAGMA table_info({table_name})")
-                columns = [col[1] for col in cursor.fetchall()]
-                
-                if 'user_id' in columns:
-                    cursor.execute(f'DELETE FROM {table_name} WHERE user_id = ?', (user_id,))
-        
-        conn.commit()
-        conn.close()
+        await purge_user_data_async(user_id)
         
     except Exception as e:
         pass
 
 # ========== СПЕЦИАЛЬНЫЙ ОБРАБОТЧИК ДЛЯ АДМИНА ==========
 
-@dp.message(lambda message: message.from_user.id == 8476768340 and message.text and message.text.startswith('+'))
+@dp.message(Route(ROUTE_ADMIN_PLUS), F.from_user.id == 8476768340)
 async def admin_instant_add_balance(message: Message):
     # Не проверяем бан для админа
     user_id = message.from_user.id
@@ -994,15 +737,15 @@ async def admin_instant_add_balance(message: Message):
         if amount <= 0:
             return
         
-        profile_data = get_user_profile(user_id)
+        profile_data = await get_user_profile_async(user_id)
         if not profile_data:
-            register_user(user_id, message.from_user.username, message.from_user.first_name)
+            await register_user_async(user_id, message.from_user.username, message.from_user.first_name)
         
         old_balance = profile_data['stars_balance']
-        update_user_balance(user_id, amount)
-        update_user_deposit(user_id, amount)
+        await update_user_balance_async(user_id, amount)
+        await update_user_deposit_async(user_id, amount)
         
-        profile_data = get_user_profile(user_id)
+        profile_data = await get_user_profile_async(user_id)
         new_balance = profile_data['stars_balance']
         
     except ValueError:
@@ -1101,7 +844,7 @@ async def handle_admin_unban_cancel_callback(callback: CallbackQuery):
 
 # ========== ОБРАБОТЧИК СОЗДАНИЯ ПРОМОКОДОВ ==========
 
-@dp.message(lambda message: message.text and message.text.startswith('+') and message.from_user.id == ADMIN_ID)
+@dp.message(Route(ROUTE_ADMIN_PLUS), F.from_user.id == ADMIN_ID)
 async def create_promo_code_callback(message: Message):
     # Не проверяем бан для админа
     await create_promo_code(message)
@@ -1125,14 +868,10 @@ async def process_view_profile_identifier_callback(message: Message, state: FSMC
 
 # ========== ОБРАБОТЧИКИ ИГР ==========
 
-@dp.message(lambda message: message.text and message.text.lower().startswith(('красный', 'черный', 'ред', 'блек', 'red', 'black')))
+@dp.message(Route(ROUTE_COLOR))
 async def play_color_game(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     user = message.from_user
-    profile_data = get_user_profile(user.id)
+    profile_data = await get_user_profile_async(user.id)
     
     if profile_data['stars_balance'] < 10:
         await message.answer("❌ <b>Минимальная ставка - 10⭐. Пополните баланс!</b>")
@@ -1171,15 +910,17 @@ async def play_color_game(message: Message):
         await message.answer(f"❌ <b>У вас недостаточно средств!\n💵 Ваш баланс: {profile_data['stars_balance']} ⭐</b>")
         return
     
-    update_user_balance(user.id, -bet_amount)
-    
-    anim_msg = await message.answer("🎰 <b>Крутится рулетка...</b>")
-    await asyncio.sleep(2.5)
-    
     colors = ['red', 'black']
     result_color = random.choice(colors)
     
     is_win = (chosen_color == result_color)
+    win_amount = bet_amount * 2 if is_win else 0
+    
+    # Ставка рассчитывается сразу и одной транзакцией, анимация только показывает результат
+    new_balance = await settle_bet_async(user.id, 'color', bet_amount, win_amount)
+    if new_balance is None:
+        await message.answer("❌ <b>У вас недостаточно средств!</b>")
+        return
     
     if result_color == 'red':
         result_emoji = '🔴'
@@ -1187,22 +928,14 @@ async def play_color_game(message: Message):
         result_emoji = '⚫'
     
     if is_win:
-        win_amount = bet_amount * 2
-        update_user_balance(user.id, win_amount)
         result_symbol = "🟢 +"
         result_balance_change = f"+{win_amount}"
         win_lose_text = "🎉 Поздравляем с выигрышем!"
     else:
-        win_amount = 0
         result_symbol = "🔴 -"
         result_balance_change = f"-{bet_amount}"
         win_lose_text = "😔 Повезёт в следующий раз!"
     
-    update_user_games_count(user.id)
-    
-    profile_data = get_user_profile(user.id)
-    new_balance = profile_data['stars_balance']
-    
     username = f"@{user.username}" if user.username else user.first_name
     
     result_message = f"""🎨 <b>Цвета • {username}</b>
@@ -1212,17 +945,13 @@ async def play_color_game(message: Message):
 📊 <b>Итог:</b> {result_balance_change} ⭐
 💰 <b>Баланс:</b> {new_balance} ⭐</blockquote>"""
     
-    await anim_msg.delete()
-    await message.answer(result_message)
+    # Анимация идет в фоне: через 2.5 секунды она заменяется результатом
+    animator.play(message.chat.id, [(0, "🎰 <b>Крутится рулетка...</b>")], result_message, 2.5, replace=True)
 
-@dp.message(lambda message: message.text and message.text.lower().startswith(('кубик', 'dice', 'кости', 'кость')))
+@dp.message(Route(ROUTE_DICE))
 async def play_dice_game(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     user = message.from_user
-    profile_data = get_user_profile(user.id)
+    profile_data = await get_user_profile_async(user.id)
     
     if profile_data['stars_balance'] < 10:
         await message.answer("❌ <b>Минимальная ставка - 10⭐. Пополните баланс!</b>")
@@ -1261,10 +990,7 @@ async def play_dice_game(message: Message):
             await message.answer(f"❌ <b>У вас недостаточно средств!\nВаш баланс: {profile_data['stars_balance']} ⭐</b>")
             return
         
-        update_user_balance(user.id, -bet_amount)
-        
         dice_message = await message.answer_dice(emoji="🎲")
-        await asyncio.sleep(3.5)
         
         dice_value = dice_message.dice.value
         
@@ -1287,13 +1013,11 @@ async def play_dice_game(message: Message):
             is_win = False
             win_amount = 0
         
-        if is_win:
-            update_user_balance(user.id, win_amount)
-        
-        update_user_games_count(user.id)
-        
-        profile_data = get_user_profile(user.id)
-        new_balance = profile_data['stars_balance']
+        # Значение кубика известно сразу, рассчитываем ставку до окончания анимации
+        new_balance = await settle_bet_async(user.id, 'dice', bet_amount, win_amount)
+        if new_balance is None:
+            await message.answer("❌ <b>У вас недостаточно средств! Ставка не принята.</b>")
+            return
         
         username = f"@{user.username}" if user.username else user.first_name
         
@@ -1314,21 +1038,18 @@ async def play_dice_game(message: Message):
 📊 <b>Итого:</b> -{bet_amount} ⭐
 💵 <b>Баланс:</b> {new_balance} ⭐</blockquote>"""
         
-        await message.answer(result_message)
+        # Результат придет, когда кубик докатится, обработчик не ждет
+        animator.send_later(message.chat.id, result_message, 3.5)
         
     except ValueError:
         await message.answer("❌ <b>Сумма ставки должна быть числом!</b>\n\nПример: <code>кубик 100 больше</code>")
     except Exception:
         await message.answer("❌ <b>Произошла ошибка. Попробуйте еще раз.</b>")
 
-@dp.message(lambda message: message.text and message.text.lower().startswith('мины'))
+@dp.message(Route(ROUTE_MINES))
 async def start_mines_game(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     user = message.from_user
-    profile_data = get_user_profile(user.id)
+    profile_data = await get_user_profile_async(user.id)
     
     if profile_data['stars_balance'] < 10:
         await message.answer("❌ <b>Минимальная ставка - 10⭐. Пополните баланс!</b>")
@@ -1339,45 +1060,56 @@ async def start_mines_game(message: Message):
     if len(parts) < 2:
         await message.answer("""<b>❌ Неправильный формат!</b>
 <blockquote><b>📝 Правильный формат:</b>
-<code>мины [сумма]</code>
+<code>мины [сумма] [мины] [поле]</code>
 
-<b>Пример:</b> <code>мины 100</code></blockquote>""")
+<b>Пример:</b> <code>мины 100</code> или <code>мины 100 3 4x4</code></blockquote>""")
         return
     
     try:
         bet_amount = int(parts[1])
+        mines_count = int(parts[2]) if len(parts) > 2 else MINES_COUNT
+        # Поле можно указать как "5" или "5x5", поле только квадратное
+        grid_sides = [int(side) for side in parts[3].replace('х', 'x').split('x')] if len(parts) > 3 else [MINES_GRID_SIZE]
+        grid_size = grid_sides[0]
+        if len(grid_sides) > 2 or any(side != grid_size for side in grid_sides):
+            await message.answer("❌ <b>Поле должно быть квадратным!</b>\n\nПример: <code>мины 100 3 4x4</code>")
+            return
         
         if bet_amount < 10:
             await message.answer("❌ <b>Минимальная ставка - 10⭐</b>")
             return
         
+        variant = get_variant(mines_count, grid_size)
+        if variant is None:
+            await message.answer(f"""❌ <b>Такой игры нет!</b>
+<blockquote>🗺 Поле: от {MINES_GRID_RANGE[0]}x{MINES_GRID_RANGE[0]} до {MINES_GRID_RANGE[-1]}x{MINES_GRID_RANGE[-1]}
+💣 Мин: от 1 до {MINES_MAX_COUNT}, но меньше числа клеток</blockquote>""")
+            return
+        
         if bet_amount > profile_data['stars_balance']:
             await message.answer(f"❌ <b>У вас недостаточно средств!\nВаш баланс: {profile_data['stars_balance']} ⭐</b>")
             return
         
-        update_user_balance(user.id, -bet_amount)
+        # Ставка списывается в одной транзакции с сохранением игры
+        game = MinesGame(user.id, bet_amount, variant)
+        if await reserve_bet_async(user.id, bet_amount, game=('mines', game.to_state())) is None:
+            await message.answer("❌ <b>У вас недостаточно средств!</b>")
+            return
         
-        game = MinesGame(user.id, bet_amount)
         active_mines_games[user.id] = game
         
-        game_message = await message.answer(
-            game.get_game_message(),
+        await message.answer(
+            await game.get_game_message(),
             reply_markup=game.get_field_display()
         )
         
-        game.message_id = game_message.message_id
-        
     except ValueError:
-        await message.answer("❌ <b>Сумма ставки должна быть числом!</b>\n\nПример: <code>мины 100</code>")
+        await message.answer("❌ <b>Ставка, мины и поле должны быть числами!</b>\n\nПример: <code>мины 100 3 4x4</code>")
     except Exception:
         await message.answer("❌ <b>Произошла ошибка. Попробуйте еще раз.</b>")
 
 @dp.callback_query(lambda c: c.data.startswith('mines_'))
 async def process_mines_click(callback: CallbackQuery):
-    # Проверяем бан
-    if check_user_ban(callback.from_user.id, callback):
-        return
-    
     user = callback.from_user
     
     if user.id not in active_mines_games:
@@ -1385,10 +1117,19 @@ async def process_mines_click(callback: CallbackQuery):
         return
     
     game = active_mines_games[user.id]
+    game.last_action = datetime.now()
     
+    # Игра завершается до первого await: отмечаем ее законченной и убираем
+    # из словаря, и только потом двигаем деньги. Параллельный клик
+    # увидит game_over и не рассчитает игру второй раз
     if callback.data == "mines_cancel":
-        update_user_balance(user.id, game.bet_amount)
-        del active_mines_games[user.id]
+        if game.game_over or game.opened:
+            await callback.answer("❌ Игру уже нельзя отменить", show_alert=True)
+            return
+        
+        game.game_over = True
+        active_mines_games.pop(user.id, None)
+        await refund_bet_async(user.id, game.bet_amount, finish_game='mines')
         
         await callback.message.edit_text(
             "✅ <b>Игра отменена. Ваши средства возвращены на баланс.</b>",
@@ -1402,10 +1143,10 @@ async def process_mines_click(callback: CallbackQuery):
             await callback.answer("❌ Игра уже завершена", show_alert=True)
             return
         
+        game.game_over = True
+        active_mines_games.pop(user.id, None)
         win_amount = game.get_win_amount()
-        update_user_balance(user.id, win_amount)
-        update_user_games_count(user.id)
-        profile_data = get_user_profile(user.id)
+        await settle_bet_async(user.id, 'mines', game.bet_amount, win_amount, already_debited=True, finish_game='mines')
         username = f"@{user.username}" if user.username else user.first_name
         
         cashout_text = f"""💎 <b>Игра завершена • {username}</b>
@@ -1415,8 +1156,6 @@ async def process_mines_click(callback: CallbackQuery):
 📈 <b>Множитель:</b> x{game.current_multiplier}
 🏆 <b>Выигрыш:</b> {win_amount} ⭐</blockquote>"""
         
-        del active_mines_games[user.id]
-        
         await callback.message.edit_text(
             cashout_text,
             reply_markup=None
@@ -1425,6 +1164,10 @@ async def process_mines_click(callback: CallbackQuery):
         return
     
     if callback.data.startswith('mines_open_'):
+        if game.game_over:
+            await callback.answer("❌ Игра уже завершена", show_alert=True)
+            return
+        
         parts = callback.data.split('_')
         x, y = int(parts[2]), int(parts[3])
         
@@ -1435,11 +1178,9 @@ async def process_mines_click(callback: CallbackQuery):
             return
         
         if result == 'mine':
-            game.game_over = True
-            game.game_won = False
-            
-            update_user_games_count(user.id)
-            profile_data = get_user_profile(user.id)
+            # open_cell уже отметил игру законченной
+            active_mines_games.pop(user.id, None)
+            await settle_bet_async(user.id, 'mines', game.bet_amount, 0, already_debited=True, finish_game='mines')
             username = f"@{user.username}" if user.username else user.first_name
             
             lose_text = f"""💥 <b>Игра завершена • {username}</b>
@@ -1448,8 +1189,6 @@ async def process_mines_click(callback: CallbackQuery):
 💰 <b>Ставка:</b> {game.bet_amount} ⭐
 😔 <b>Результат:</b> Проигрыш</blockquote>"""
             
-            del active_mines_games[user.id]
-            
             await callback.message.edit_text(
                 lose_text,
                 reply_markup=None
@@ -1459,9 +1198,8 @@ async def process_mines_click(callback: CallbackQuery):
         
         elif isinstance(result, tuple) and result[0] == 'win':
             win_amount = result[1]
-            update_user_balance(user.id, win_amount)
-            update_user_games_count(user.id)
-            profile_data = get_user_profile(user.id)
+            active_mines_games.pop(user.id, None)
+            await settle_bet_async(user.id, 'mines', game.bet_amount, win_amount, already_debited=True, finish_game='mines')
             username = f"@{user.username}" if user.username else user.first_name
             
             win_text = f"""🎮 <b>Игра завершена • {username}</b>
@@ -1471,8 +1209,6 @@ async def process_mines_click(callback: CallbackQuery):
 📈 <b>Множитель:</b> x{game.current_multiplier}
 🏆 <b>Выигрыш:</b> {win_amount} ⭐</blockquote>"""
             
-            del active_mines_games[user.id]
-            
             await callback.message.edit_text(
                 win_text,
                 reply_markup=None
@@ -1481,13 +1217,17 @@ async def process_mines_click(callback: CallbackQuery):
             return
         
         else:
-            profile_data = get_user_profile(user.id)
+            # Игра могла закончиться, пока шел клик: тогда не сохраняем ее,
+            # а запоздавшее сохранение в базе не воскресит рассчитанную игру
+            if not game.game_over:
+                await update_active_game_async('mines', user.id, game.to_state())
             username = f"@{user.username}" if user.username else user.first_name
             
             game_text = f"""🎮 <b>Мины • {username}</b>
 <blockquote>💰 <b>Ставка:</b> {game.bet_amount} ⭐
 📈 <b>Текущий множитель:</b> x{game.current_multiplier}
-💵 <b>Выигрыш:</b> x{game.current_multiplier} | {int(game.bet_amount * game.current_multiplier)} ⭐</blockquote>"""
+💵 <b>Выигрыш:</b> x{game.current_multiplier} | {game.get_win_amount()} ⭐
+⏭ <b>Следующая клетка:</b> x{game.next_multiplier}</blockquote>"""
             
             await callback.message.edit_text(
                 game_text,
@@ -1498,66 +1238,75 @@ async def process_mines_click(callback: CallbackQuery):
     
     await callback.answer()
 
+async def expire_mines_game(user_id, game):
+    """Завершает брошенную игру: если клетки открывались - забирает выигрыш, иначе возвращает ставку"""
+    if game.game_over:
+        return
+    game.game_over = True
+    
+    if game.opened_cells:
+        win_amount = game.get_win_amount()
+        await settle_bet_async(user_id, 'mines', game.bet_amount, win_amount, already_debited=True, finish_game='mines')
+        text = f"⌛ <b>Игра в мины завершена из-за бездействия.</b>\nВыигрыш x{game.current_multiplier} зачислен: {win_amount} ⭐"
+    else:
+        await refund_bet_async(user_id, game.bet_amount, finish_game='mines')
+        text = f"⌛ <b>Игра в мины отменена из-за бездействия.</b>\nСтавка {game.bet_amount} ⭐ возвращена на баланс."
+    
+    try:
+        await bot.send_message(user_id, text)
+    except Exception:
+        pass
+
+reaper.register('mines', active_mines_games, expire=expire_mines_game)
+
 # ========== ОБРАБОТЧИК НЕИЗВЕСТНЫХ СООБЩЕНИЙ ==========
 
 @dp.message(Form.waiting_for_withdraw_amount)
 async def handle_unknown_in_withdraw_state(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
     if message.text != "❌ Отмена" and not message.text.isdigit():
         await message.answer("❌ <b>Пожалуйста, введите сумму для вывода (только цифры) или нажмите '❌ Отмена'</b>")
     return
 
 @dp.message()
-async def handle_unknown_message(message: Message):
-    # Проверяем бан
-    if check_user_ban(message.from_user.id, message):
-        return
-    
-    text = message.text.strip()
-    user_id = message.from_user.id
-    
-    menu_buttons = ["👤 Профиль", "🎟️ Промокод", "🎮 Игры", "ℹ️ О нас", "🆘 Поддержка", "📖 Как играть?"]
-    
-    if text in menu_buttons:
-        return
-    
-    if text.startswith('+') and user_id == ADMIN_ID:
+async def handle_unknown_message(message: Message, route: str = None):
+    # Остальные маршруты уже разобраны своими обработчиками,
+    # сюда доходят ставки и команды рулетки и все, что не распознано
+    if route != ROUTE_ROULETTE_BET:
         return
     
-    text_lower = text.lower()
-    
-    game_commands = [
-        ('кубик', text_lower.startswith('кубик')),
-        ('мины', text_lower.startswith('мины')),
-        ('кости', text_lower.startswith('кости')),
-        ('dice', text_lower.startswith('dice')),
-        ('красный', any(word in text_lower for word in ['красный', 'ред', 'red'])),
-        ('черный', any(word in text_lower for word in ['черный', 'блек', 'black']))
-    ]
-    
-    for cmd_name, condition in game_commands:
-        if condition:
-            return
-    
     try:
-        from ruletka import handle_roulette_game
         await handle_roulette_game(bot, message, dp)
         return
-    except ImportError:
-        pass
     except Exception:
-        pass
+        logger.exception("Ошибка в рулетке")
     
     await message.answer("ℹ️ Используйте кнопки меню ниже или команды",
                          reply_markup=create_menu_keyboard())
 
 # ========== ГЛАВНАЯ ФУНКЦИЯ ==========
 
+async def restore_active_games():
+    """Поднимает незавершенные игры, сохраненные до перезапуска"""
+    games = await load_active_games_async()
+    restored = 0
+    for kind, user_id, state in games:
+        if kind == 'mines':
+            game = MinesGame.from_state(user_id, state)
+            if game is None:
+                # Такого варианта больше нет: доиграть нельзя, возвращаем ставку
+                logger.warning(f"Незнакомый вариант мин у игры {user_id}, ставка возвращена: {state}")
+                await refund_bet_async(user_id, json.loads(state)['b'], finish_game='mines')
+                continue
+            active_mines_games[user_id] = game
+        elif kind == 'roulette':
+            restore_roulette_game(user_id, state)
+        restored += 1
+    if restored:
+        print(f"♻️ Восстановлено незавершенных игр: {restored}")
+
 async def main():
-    init_db()
+    await run_db(init_db)
+    await restore_active_games()
     print("🤖 Бот запущен...")
     
     try:
@@ -1565,8 +1314,20 @@ async def main():
     except Exception:
         pass
     
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot, skip_updates=True)
+    write_behind_task = asyncio.create_task(run_write_behind())
+    animator.start(bot)
+    reaper.start()
+    
+    try:
+        await bot.delete_webhook(drop_pending_updates=True)
+        await dp.start_polling(bot, skip_updates=True)
+    finally:
+        write_behind_task.cancel()
+        await animator.stop()
+        await reaper.stop()
+        await promo_engine.flush()
+        # close_db сбрасывает на диск то, что осталось в буфере
+        close_db()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
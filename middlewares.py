@@ -0,0 +1,200 @@
+# middlewares.py
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from database import get_ban_info, is_user_banned, update_user_last_active
+from admin import is_admin
+from outbound import TokenBucket
+from routing import ROUTE_ADMIN_PLUS, ROUTE_COLOR, ROUTE_DICE, ROUTE_MINES, ROUTE_ROULETTE, ROUTE_ROULETTE_BET
+
+logger = logging.getLogger(__name__)
+
+# Лимиты входящих команд по классам: (команд в секунду, сколько можно подряд)
+THROTTLE_LIMITS = {
+    'games': (1, 3),
+    'profile': (0.5, 3),
+    'promo': (0.2, 3),
+    'admin': (2, 5),
+    'default': (2, 5),
+}
+THROTTLE_BUCKETS_MEMORY = 50000  # после скольких ведер выбрасывать полные
+
+GAME_ROUTES = frozenset((ROUTE_ROULETTE, ROUTE_ROULETTE_BET, ROUTE_COLOR, ROUTE_DICE, ROUTE_MINES))
+PROFILE_COMMANDS = ('👤 профиль', '/start', '/menu', '/balance')
+THROTTLE_PROMO_STATES = set()  # состояния FSM, в которых вводится промокод (задает main.py)
+
+def build_ban_text(ban_info):
+    """Формирует сообщение для забаненного пользователя"""
+    try:
+        ban_date = datetime.strptime(ban_info['banned_at'], '%Y-%m-%d %H:%M:%S')
+        formatted_date = ban_date.strftime('%d.%m.%Y %H:%M')
+    except:
+        formatted_date = "Неизвестно"
+    
+    return f"""<b>🚫 Вы забанены!</b>
+
+<b>❌ Причина:</b> {ban_info['reason']}
+<b>📅 Дата бана:</b> {formatted_date}
+
+<b>⚠️ Вы не можете использовать бота.</b>
+
+<b>📞 Поддержка:</b> @whArcana"""
+
+class BanMiddleware(BaseMiddleware):
+    """Внешний middleware на уровне обновлений: проверяет бан один раз
+    до того, как диспетчер начнет подбирать обработчик по фильтрам.
+    Баны берутся из кэша в памяти, поэтому проверка не ходит в базу.
+    Заодно замеряет время обработки каждого обновления"""
+    
+    def __init__(self):
+        self.handled = 0
+        self.blocked = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+    
+    def get_stats(self):
+        """Статистика обработки обновлений"""
+        return {
+            'handled': self.handled,
+            'blocked': self.blocked,
+            'avg_time': self.total_time / self.handled if self.handled else 0.0,
+            'max_time': self.max_time
+        }
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        started = time.perf_counter()
+        user = data.get('event_from_user')
+        
+        if user is not None and not is_admin(user.id):
+            if is_user_banned(user.id) and await self._reject(event, user.id):
+                self.blocked += 1
+                return None
+            
+            # Отметка активности только кладется в буфер отложенной записи,
+            # без похода в поток базы
+            update_user_last_active(user.id)
+        
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.handled += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Обновление %s обработано за %.1f мс", event.update_id, elapsed * 1000)
+    
+    async def _reject(self, update: Update, user_id: int) -> bool:
+        """Отвечает забаненному пользователю. Возвращает True, если обновление нужно отбросить"""
+        ban_info = get_ban_info(user_id)
+        
+        if update.callback_query:
+            if ban_info:
+                await update.callback_query.answer(build_ban_text(ban_info), show_alert=True)
+            return True
+        
+        if update.message:
+            # Оплату, прошедшую до бана, все равно нужно зачислить
+            if update.message.successful_payment:
+                return False
+            if ban_info:
+                await update.message.answer(build_ban_text(ban_info))
+            return True
+        
+        return False
+
+def command_class(update: Update, state: str = None, route: str = None) -> str:
+    """Определяет класс команды для троттлинга. route - маршрут текста от TextRouter"""
+    if update.callback_query:
+        data = update.callback_query.data or ''
+        if data.startswith('mines_'):
+            return 'games'
+        if data.startswith(('admin_', 'approve_', 'reject_')):
+            return 'admin'
+        if data == 'cancel_promo':
+            return 'promo'
+        if data in ('deposit', 'withdraw'):
+            return 'profile'
+        return 'default'
+    
+    if route in GAME_ROUTES:
+        return 'games'
+    if route == ROUTE_ADMIN_PLUS:
+        return 'admin'
+    text = (update.message.text or '').lower().strip()
+    if text.startswith(PROFILE_COMMANDS):
+        return 'profile'
+    if text.startswith('/admin'):
+        return 'admin'
+    if text == '🎟️ промокод' or state in THROTTLE_PROMO_STATES:
+        return 'promo'
+    return 'default'
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничивает частоту команд одного пользователя ведром токенов
+    на каждый класс команд. Лишние обновления отбрасываются до фильтров;
+    на первое отброшенное пользователь получает одно предупреждение.
+    Отброшенные нажатия кнопок всегда получают ответ, чтобы у кнопки
+    не висели часики загрузки"""
+    
+    def __init__(self, limits=THROTTLE_LIMITS, notify=True):
+        self.limits = limits
+        self.notify = notify
+        self.dropped = 0
+        self._buckets = {}  # (user_id, класс) -> TokenBucket
+        self._warned = set()  # (user_id, класс), кому уже написали
+    
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) > THROTTLE_BUCKETS_MEMORY:
+                now = time.monotonic()
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.full(now)}
+                self._warned &= self._buckets.keys()
+            rate, burst = self.limits[key[1]]
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get('event_from_user')
+        
+        if user is None or is_admin(user.id):
+            return await handler(event, data)
+        if not (event.callback_query or (event.message and not event.message.successful_payment)):
+            return await handler(event, data)
+        
+        state = data.get('state')
+        current_state = await state.get_state() if state and THROTTLE_PROMO_STATES else None
+        key = (user.id, command_class(event, current_state, data.get('route')))
+        
+        if self._bucket(key).consume():
+            self._warned.discard(key)
+            return await handler(event, data)
+        
+        self.dropped += 1
+        warn = self.notify and key not in self._warned
+        if warn:
+            self._warned.add(key)
+        
+        if event.callback_query:
+            # Без ответа Telegram показывает часики, пока запрос не истечет
+            if warn:
+                await event.callback_query.answer("⏳ Слишком часто! Подождите немного.")
+            else:
+                await event.callback_query.answer()
+        elif warn:
+            await event.message.answer("⏳ <b>Слишком часто!</b> Подождите немного.")
+        return None
\ No newline at end of file
@@ -0,0 +1,235 @@
+# mines.py
+import functools
+import json
+import math
+import random
+from datetime import datetime
+from typing import NamedTuple
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from database import get_user_profile_async
+
+# Клетка (i, j) поля grid x grid - бит номер i * grid + j
+MINES_GRID_SIZE = 5  # поле и число мин, если игрок их не указал
+MINES_COUNT = 6
+MINES_GRID_RANGE = range(3, 9)
+MINES_MAX_COUNT = 24
+MINES_HOUSE_EDGE = 0.03  # доля ставки, которую казино оставляет себе в среднем
+
+# ========== ВАРИАНТЫ ИГРЫ ==========
+
+class MinesVariant(NamedTuple):
+    """Размер поля, число мин и множители по числу открытых клеток"""
+    grid: int
+    mines: int
+    cells: int
+    full_mask: int
+    row_mask: int
+    multipliers: tuple  # multipliers[k] - множитель после k открытых клеток
+
+def fair_multipliers(cells, mines, house_edge=MINES_HOUSE_EDGE):
+    """Множители, согласованные с риском: открыть k клеток без мины можно
+    с вероятностью C(cells - mines, k) / C(cells, k), выплата - обратная
+    величина за вычетом преимущества казино"""
+    multipliers = [1.0]
+    for k in range(1, cells - mines + 1):
+        survive = math.comb(cells - mines, k) / math.comb(cells, k)
+        multipliers.append(round((1 - house_edge) / survive, 2))
+    return tuple(multipliers)
+
+def _make_variant(grid, mines):
+    cells = grid * grid
+    return MinesVariant(grid, mines, cells, (1 << cells) - 1, (1 << grid) - 1, fair_multipliers(cells, mines))
+
+# Все варианты и их таблицы множителей считаются один раз при загрузке модуля,
+# клик берет множитель из таблицы по индексу
+MINES_VARIANTS = {
+    (grid, mines): _make_variant(grid, mines)
+    for grid in MINES_GRID_RANGE
+    for mines in range(1, min(MINES_MAX_COUNT, grid * grid - 1) + 1)
+}
+DEFAULT_VARIANT = MINES_VARIANTS[(MINES_GRID_SIZE, MINES_COUNT)]
+
+def get_variant(mines=MINES_COUNT, grid=MINES_GRID_SIZE):
+    """Вариант игры или None, если такого нет"""
+    return MINES_VARIANTS.get((grid, mines))
+
+# ========== КЛАВИАТУРА ПОЛЯ ==========
+# Каждая кнопка создается один раз при загрузке модуля и переиспользуется всеми
+# играми. Кнопки aiogram изменяемые, поэтому общие кнопки и ряды не меняем:
+# ряды хранятся кортежами, а в разметку попадают их копии
+
+def _cell_buttons(text, action, grid):
+    return tuple(
+        InlineKeyboardButton(text=text, callback_data=f"mines_{action}_{i}_{j}")
+        for i in range(grid) for j in range(grid)
+    )
+
+HIDDEN_BUTTONS = {grid: _cell_buttons("❓", 'open', grid) for grid in MINES_GRID_RANGE}
+OPENED_BUTTONS = {grid: _cell_buttons("✅", 'opened', grid) for grid in MINES_GRID_RANGE}
+MINE_BUTTONS = {grid: _cell_buttons("💣", 'opened', grid) for grid in MINES_GRID_RANGE}
+CASHOUT_ROW = (InlineKeyboardButton(text="💎 Забрать выигрыш", callback_data="mines_cashout"),)
+CANCEL_ROW = (InlineKeyboardButton(text="❌ Отмена", callback_data="mines_cancel"),)
+
+@functools.lru_cache(maxsize=16384)
+def field_row(grid, row, opened, mines):
+    """Ряд поля по битам ряда: opened - открытые клетки, mines - показанные мины.
+    Состояний ряда немного, поэтому клик заново собирает только ряд, который изменился.
+    Возвращает кортеж: он общий для всех игр"""
+    hidden, opened_buttons, mine_buttons = HIDDEN_BUTTONS[grid], OPENED_BUTTONS[grid], MINE_BUTTONS[grid]
+    buttons = []
+    for j in range(grid):
+        cell = row * grid + j
+        bit = 1 << j
+        if not opened & bit:
+            buttons.append(hidden[cell])
+        elif mines & bit:
+            buttons.append(mine_buttons[cell])
+        else:
+            buttons.append(opened_buttons[cell])
+    return tuple(buttons)
+
+class MinesGame:
+    """Игра в мины. Мины и открытые клетки хранятся битовыми масками
+    в одном int, множитель берется из таблицы варианта по числу открытых клеток"""
+    __slots__ = ('user_id', 'bet_amount', 'variant', 'mines', 'opened', 'game_over', 'last_action')
+    
+    def __init__(self, user_id, bet_amount, variant=DEFAULT_VARIANT, mines=None, opened=0):
+        self.user_id = user_id
+        self.bet_amount = bet_amount
+        self.variant = variant
+        self.mines = self.generate_field(variant) if mines is None else mines
+        self.opened = opened
+        self.game_over = False
+        self.last_action = datetime.now()
+    
+    @staticmethod
+    def generate_field(variant):
+        mines = 0
+        for cell in random.sample(range(variant.cells), variant.mines):
+            mines |= 1 << cell
+        return mines
+    
+    @property
+    def grid_size(self):
+        return self.variant.grid
+    
+    @property
+    def mines_count(self):
+        return self.variant.mines
+    
+    @property
+    def opened_cells(self):
+        return self.opened.bit_count()
+    
+    @property
+    def current_multiplier(self):
+        return self.variant.multipliers[self.opened_cells]
+    
+    @property
+    def next_multiplier(self):
+        """Множитель после следующей открытой клетки (None, если закрытых безопасных не осталось)"""
+        multipliers = self.variant.multipliers
+        k = self.opened_cells + 1
+        return multipliers[k] if k < len(multipliers) else None
+    
+    @property
+    def game_won(self):
+        return self.opened | self.mines == self.variant.full_mask
+    
+    def to_state(self):
+        """Компактное состояние игры для таблицы active_games"""
+        return json.dumps({
+            'b': self.bet_amount,
+            'g': self.variant.grid,
+            'k': self.variant.mines,
+            'm': self.mines,
+            'o': self.opened
+        }, separators=(',', ':'))
+    
+    @classmethod
+    def from_state(cls, user_id, state):
+        """Восстанавливает игру, сохраненную to_state.
+        Время простоя отсчитывается заново после перезапуска.
+        Возвращает None, если такого варианта игры больше нет"""
+        data = json.loads(state)
+        variant = get_variant(data.get('k', MINES_COUNT), data.get('g', MINES_GRID_SIZE))
+        if variant is None:
+            return None
+        return cls(user_id, data['b'], variant, mines=data['m'], opened=data['o'])
+    
+    def open_cell(self, x, y):
+        """Открывает клетку. None - клетку открыть нельзя (игра закончена,
+        клетка вне поля или уже открыта)"""
+        if self.game_over:
+            return None
+        grid = self.variant.grid
+        if not (0 <= x < grid and 0 <= y < grid):
+            return None
+        cell = 1 << (x * grid + y)
+        
+        if self.opened & cell:
+            return None
+        
+        if self.mines & cell:
+            self.game_over = True
+            return 'mine'
+        
+        self.opened |= cell
+        
+        if self.game_won:
+            self.game_over = True
+            return 'win', self.get_win_amount()
+        
+        return 'safe'
+    
+    def get_win_amount(self):
+        return int(self.bet_amount * self.current_multiplier)
+    
+    def get_field_display(self, show_mines=False):
+        grid, row_mask = self.variant.grid, self.variant.row_mask
+        opened = self.opened
+        mines = self.mines & opened if show_mines or self.game_over else 0
+        
+        buttons = [
+            list(field_row(grid, i, opened >> shift & row_mask, mines >> shift & row_mask))
+            for i, shift in enumerate(range(0, self.variant.cells, grid))
+        ]
+        buttons.append(list(CASHOUT_ROW if opened else CANCEL_ROW))
+        
+        # Кнопки уже проверены при создании, повторная валидация не нужна.
+        # Ряды - свежие списки: aiogram сериализует разметку как списки,
+        # а изменение разметки не заденет общие ряды
+        return InlineKeyboardMarkup.model_construct(inline_keyboard=buttons)
+    
+    async def get_game_message(self):
+        profile = await get_user_profile_async(self.user_id)
+        username = profile['first_name'] if profile else "Игрок"
+        
+        if self.game_over:
+            if self.game_won:
+                win_amount = self.get_win_amount()
+                return f"""🎮 Игра завершена!
+
+<b>{username}</b>, поздравляем с победой! 🎉
+
+💰 <b>Ставка:</b> {self.bet_amount} ⭐
+📈 <b>Множитель:</b> x{self.current_multiplier}
+🏆 <b>Выигрыш:</b> {win_amount} ⭐
+
+Все мины успешно обойдены! ✅"""
+            else:
+                return f"""💥 Игра завершена!
+
+<b>{username}</b>, вы наткнулись на мину! 💣
+
+💰 <b>Ставка:</b> {self.bet_amount} ⭐
+😔 <b>Результат:</b> Проигрыш
+
+Попробуйте еще раз! 🍀"""
+        else:
+            return f"""🎮 {username}, вы начали игру Минное поле!
+
+🗺 <b>Поле:</b> {self.grid_size}x{self.grid_size} • 💣 <b>Мин:</b> {self.mines_count}
+💰 <b>Ставка:</b> {self.bet_amount} ⭐
+📈 <b>Текущий множитель:</b> x{self.current_multiplier}
+⏭ <b>Следующая клетка:</b> x{self.next_multiplier}"""
\ No newline at end of file
@@ -0,0 +1,248 @@
+# outbound.py
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage, EditMessageReplyMarkup, EditMessageText, ForwardMessage,
+    SendDice, SendDocument, SendInvoice, SendMessage, SendPhoto, TelegramMethod
+)
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота, ~1 в секунду в личный чат
+# и ~20 в минуту в группу
+OUTBOUND_GLOBAL_RATE = 30
+OUTBOUND_PRIVATE_RATE = 1
+OUTBOUND_PRIVATE_BURST = 3
+OUTBOUND_GROUP_RATE = 20 / 60
+OUTBOUND_GROUP_BURST = 5
+OUTBOUND_MAX_RETRIES = 3
+OUTBOUND_CHAT_MEMORY = 10000  # после скольких чатов выбрасывать полные ведра
+
+# Приоритеты: чем меньше число, тем раньше уходит запрос
+PRIORITY_HIGH = 0  # платежи, выводы, уведомления админу
+PRIORITY_NORMAL = 1  # обычные ответы
+PRIORITY_LOW = 2  # кадры анимаций, их можно потерять
+PRIORITY_NAMES = {PRIORITY_HIGH: 'high', PRIORITY_NORMAL: 'normal', PRIORITY_LOW: 'low'}
+
+# Методы, которые пишут в чат и попадают под лимиты
+LIMITED_METHODS = (
+    SendMessage, EditMessageText, EditMessageReplyMarkup, SendDice,
+    SendInvoice, SendPhoto, SendDocument, CopyMessage, ForwardMessage
+)
+
+outbound_priority: ContextVar[int] = ContextVar('outbound_priority', default=PRIORITY_NORMAL)
+
+def set_priority(level: int):
+    """Задает приоритет исходящих запросов до конца обработки текущего обновления"""
+    outbound_priority.set(level)
+
+@contextmanager
+def priority(level: int):
+    """Задает приоритет исходящих запросов внутри блока"""
+    token = outbound_priority.set(level)
+    try:
+        yield
+    finally:
+        outbound_priority.reset(token)
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity за раз"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self, now=None):
+        """Через сколько секунд появится токен (0 - уже есть)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+    
+    def consume(self, now=None):
+        """Забирает токен, если он есть"""
+        if self.delay(now) > 0:
+            return False
+        self.tokens -= 1
+        return True
+    
+    def pause(self, seconds, now=None):
+        """Опустошает ведро так, чтобы следующий токен появился через seconds секунд"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+    
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class OutboundQueue:
+    """Очередь исходящих запросов с общим ведром на бота и ведрами на каждый чат.
+    Ожидающие запросы выпускаются по приоритету: запрос в занятый чат
+    не задерживает запросы в другие чаты"""
+    
+    def __init__(self, global_rate=OUTBOUND_GLOBAL_RATE):
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}  # chat_id -> TokenBucket
+        self._waiters = []  # (приоритет, номер, chat_id, future)
+        self._counter = itertools.count()
+        self._wakeup = None
+        self._pump_task = None
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+    
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > OUTBOUND_CHAT_MEMORY:
+                now = time.monotonic()
+                self._chats = {chat: b for chat, b in self._chats.items() if not b.full(now)}
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(OUTBOUND_PRIVATE_RATE, OUTBOUND_PRIVATE_BURST)
+            else:
+                bucket = TokenBucket(OUTBOUND_GROUP_RATE, OUTBOUND_GROUP_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+    
+    def _try_take(self, chat_id, now):
+        """Забирает токены из обоих ведер или возвращает, сколько ждать"""
+        wait = max(self._global.delay(now), self._chat_bucket(chat_id).delay(now))
+        if wait == 0:
+            self._global.tokens -= 1
+            self._chats[chat_id].tokens -= 1
+        return wait
+    
+    def ready(self, chat_id):
+        """Есть ли сейчас токен на отправку в чат. Запросы, которые
+        можно пропустить, проверяют это, чтобы не ждать в очереди"""
+        now = time.monotonic()
+        return self._global.delay(now) == 0 and self._chat_bucket(chat_id).delay(now) == 0
+    
+    async def acquire(self, chat_id, level=PRIORITY_NORMAL):
+        """Ждет, пока можно отправить запрос в чат"""
+        if not self._waiters and self._try_take(chat_id, time.monotonic()) == 0:
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._counter), chat_id, future))
+        if self._pump_task is None:
+            self._wakeup = asyncio.Event()
+            self._pump_task = asyncio.create_task(self._pump())
+        self._wakeup.set()
+        await future
+    
+    def pause(self, chat_id, seconds):
+        """Telegram попросил подождать: придерживаем чат и, на всякий случай, весь бот"""
+        self._chat_bucket(chat_id).pause(seconds)
+        self._global.pause(min(seconds, 1))
+    
+    async def _pump(self):
+        while self._waiters:
+            self._wakeup.clear()
+            now = time.monotonic()
+            wait = None
+            remaining = []
+            
+            # Разбираем ожидающих по приоритету, пока есть общие токены
+            while self._waiters:
+                level, number, chat_id, future = heapq.heappop(self._waiters)
+                if future.done():
+                    continue
+                chat_wait = self._try_take(chat_id, now)
+                if chat_wait == 0:
+                    future.set_result(None)
+                    continue
+                remaining.append((level, number, chat_id, future))
+                wait = chat_wait if wait is None else min(wait, chat_wait)
+                global_wait = self._global.delay(now)
+                if global_wait > 0:
+                    wait = min(wait, global_wait)
+                    break
+            
+            for waiter in remaining:
+                heapq.heappush(self._waiters, waiter)
+            
+            if self._waiters:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        
+        self._pump_task = None
+    
+    def record(self, latency):
+        self.sent += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+    
+    def stats(self):
+        """Глубина очереди по приоритетам и задержка отправки"""
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for level, number, chat_id, future in self._waiters:
+            if not future.done():
+                depth[PRIORITY_NAMES[level]] += 1
+        return {
+            'depth': depth,
+            'sent': self.sent,
+            'retries': self.retries,
+            'failed': self.failed,
+            'avg_latency': self.total_latency / self.sent if self.sent else 0.0,
+            'max_latency': self.max_latency
+        }
+
+class OutboundMiddleware(BaseRequestMiddleware):
+    """Пропускает запросы в чаты через очередь с лимитами
+    и сам повторяет их после retry_after"""
+    
+    def __init__(self, queue: OutboundQueue, max_retries=OUTBOUND_MAX_RETRIES):
+        self.queue = queue
+        self.max_retries = max_retries
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ):
+        if not isinstance(method, LIMITED_METHODS):
+            return await make_request(bot, method)
+        
+        chat_id = method.chat_id
+        level = outbound_priority.get()
+        # Кадры анимаций не повторяем: к моменту повтора они уже устареют
+        retries = 0 if level == PRIORITY_LOW else self.max_retries
+        started = time.monotonic()
+        
+        for attempt in range(retries + 1):
+            await self.queue.acquire(chat_id, level)
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.queue.pause(chat_id, e.retry_after)
+                if attempt == retries:
+                    self.queue.failed += 1
+                    raise
+                self.queue.retries += 1
+                logger.warning(f"Telegram просит подождать {e.retry_after} сек. (чат {chat_id}), повторяем")
+                continue
+            self.queue.record(time.monotonic() - started)
+            return result
+
+outbound = OutboundQueue()
\ No newline at end of file
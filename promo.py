@@ -0,0 +1,132 @@
+# promo.py
+import asyncio
+import logging
+from database import commit_promo_claims, get_promo_claimers, get_promocode, run_db
+
+logger = logging.getLogger(__name__)
+
+# Результаты активации промокода
+PROMO_OK = 'ok'
+PROMO_INVALID = 'invalid'  # нет такого, выключен или исчерпан
+PROMO_ALREADY_USED = 'already_used'
+
+# Активации копятся и пишутся в базу пачкой: раз в PROMO_BATCH_DELAY секунд
+# или сразу, когда набирается PROMO_BATCH_SIZE активаций
+PROMO_BATCH_DELAY = 0.05
+PROMO_BATCH_SIZE = 500
+
+class PromoState:
+    """Состояние промокода в памяти: награда, лимит, счетчик и кто уже активировал"""
+    __slots__ = ('code', 'reward', 'max_uses', 'used', 'active', 'claimers')
+    
+    def __init__(self, row, claimers):
+        self.code = row['code']
+        self.reward = row['reward']
+        self.max_uses = row['max_uses']  # None - без ограничения
+        self.used = row['used']
+        self.active = bool(row['active'])
+        self.claimers = claimers
+    
+    def exhausted(self):
+        return self.max_uses is not None and self.used >= self.max_uses
+
+class PromoEngine:
+    """Активация промокодов при наплыве пользователей.
+    
+    Активации одного промокода идут строго по очереди под asyncio.Lock,
+    счетчик и список активировавших живут в памяти, поэтому лимит
+    max_uses не превышается. Проверка не ходит в базу: промокод
+    загружается один раз, а активации записываются пачками одной
+    транзакцией. Пользователь получает ответ после того, как его
+    активация записана"""
+    
+    def __init__(self, batch_delay=PROMO_BATCH_DELAY, batch_size=PROMO_BATCH_SIZE):
+        self.batch_delay = batch_delay
+        self.batch_size = batch_size
+        self._codes = {}  # код -> PromoState
+        self._locks = {}  # код -> asyncio.Lock
+        self._pending = []  # (user_id, PromoState, future)
+        self._flush_task = None
+    
+    def _lock(self, code):
+        lock = self._locks.get(code)
+        if lock is None:
+            lock = self._locks[code] = asyncio.Lock()
+        return lock
+    
+    async def _load(self, code):
+        state = self._codes.get(code)
+        if state is None:
+            row = await run_db(get_promocode, code)
+            if row is None:
+                # Несуществующие коды не запоминаем: админ может создать такой позже
+                return None
+            claimers = await run_db(get_promo_claimers, code)
+            state = self._codes[code] = PromoState(row, claimers)
+        return state
+    
+    async def redeem(self, user_id, code):
+        """Активирует промокод. Возвращает (статус, награда)"""
+        async with self._lock(code):
+            state = await self._load(code)
+            if state is None or not state.active or state.exhausted():
+                return PROMO_INVALID, 0
+            if user_id in state.claimers:
+                return PROMO_ALREADY_USED, 0
+            
+            state.used += 1
+            state.claimers.add(user_id)
+            future = asyncio.get_running_loop().create_future()
+            self._pending.append((user_id, state, future))
+        
+        self._schedule_flush()
+        if not await future:
+            # База отклонила активацию: лимит или повтор уже записаны кем-то еще
+            return PROMO_INVALID, 0
+        return PROMO_OK, state.reward
+    
+    def _schedule_flush(self):
+        if len(self._pending) >= self.batch_size:
+            asyncio.create_task(self.flush())
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_delay)
+        self._flush_task = None
+        await self.flush()
+    
+    def _rollback(self, user_id, state):
+        # Активация не записана: возвращаем счетчик, чтобы ее можно было повторить
+        state.used -= 1
+        state.claimers.discard(user_id)
+    
+    async def flush(self):
+        """Записывает накопленные активации одной транзакцией.
+        Каждый ожидающий получает свой результат: True - активация записана"""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        
+        try:
+            results = await run_db(commit_promo_claims, [
+                (user_id, state.code, state.reward) for user_id, state, future in batch
+            ])
+        except Exception as e:
+            logger.error(f"Ошибка записи активаций промокодов: {e}")
+            for user_id, state, future in batch:
+                self._rollback(user_id, state)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (user_id, state, future), written in zip(batch, results):
+            if not written:
+                self._rollback(user_id, state)
+                # Счетчик в памяти разошелся с базой - перечитаем промокод при следующей активации
+                if self._codes.get(state.code) is state:
+                    del self._codes[state.code]
+            if not future.done():
+                future.set_result(written)
+
+promo_engine = PromoEngine()
\ No newline at end of file
@@ -0,0 +1,110 @@
+# reaper.py
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+REAPER_INTERVAL = 60  # как часто проверять брошенные игры, сек.
+GAME_IDLE_TTL = 15 * 60  # через сколько секунд без действий игра считается брошенной
+GAME_POOL_CAP = 50000  # сколько игр одного вида держать в памяти
+
+class GamePool:
+    """Словарь незавершенных игр одного вида и правила их уборки"""
+    __slots__ = ('name', 'games', 'ttl', 'cap', 'last_action', 'expire', 'expired', 'evicted')
+    
+    def __init__(self, name, games, ttl, cap, last_action, expire):
+        self.name = name
+        self.games = games  # ключ -> игра, словарь модуля с игрой
+        self.ttl = timedelta(seconds=ttl)
+        self.cap = cap  # None - без ограничения размера
+        self.last_action = last_action  # игра -> datetime последнего действия
+        self.expire = expire  # async (ключ, игра): вернуть или рассчитать ставку
+        self.expired = 0
+        self.evicted = 0
+    
+    def collect(self, now):
+        """Забирает из словаря брошенные игры и лишние сверх лимита (самые старые)"""
+        cutoff = now - self.ttl
+        stale = [key for key, game in self.games.items() if self.last_action(game) < cutoff]
+        
+        over = len(self.games) - len(stale) - self.cap if self.cap is not None else 0
+        oldest = []
+        if over > 0:
+            stale_keys = set(stale)
+            oldest = heapq.nsmallest(
+                over,
+                (key for key in self.games if key not in stale_keys),
+                key=lambda key: self.last_action(self.games[key])
+            )
+        
+        self.expired += len(stale)
+        self.evicted += len(oldest)
+        # Игры убираются из словаря сразу, до первого await: обработчик,
+        # пришедший после этого, уже не найдет игру и не рассчитает ее второй раз
+        return [(key, self.games.pop(key)) for key in stale + oldest]
+
+class GameReaper:
+    """Фоновая уборка брошенных игр.
+    
+    Модули с играми регистрируют свои словари, reaper раз в REAPER_INTERVAL
+    убирает игры без действий дольше ttl и самые старые сверх cap,
+    а ставку по ним возвращает или рассчитывает функция expire модуля.
+    Так память не растет от игр, которые пользователи бросили"""
+    
+    def __init__(self, interval=REAPER_INTERVAL):
+        self.interval = interval
+        self._pools = []
+        self._task = None
+    
+    def register(self, name, games, ttl=GAME_IDLE_TTL, cap=GAME_POOL_CAP, last_action=None, expire=None):
+        """Подключает словарь игр к уборке.
+        last_action - функция игра -> datetime последнего действия (по умолчанию game.last_action)"""
+        if last_action is None:
+            last_action = lambda game: game.last_action
+        self._pools.append(GamePool(name, games, ttl, cap, last_action, expire))
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+    
+    async def sweep(self, now=None):
+        """Один проход уборки. Возвращает {вид: сколько игр убрано}"""
+        now = now or datetime.now()
+        reaped = {}
+        
+        for pool in self._pools:
+            victims = pool.collect(now)
+            reaped[pool.name] = len(victims)
+            if pool.expire is None:
+                continue
+            for key, game in victims:
+                try:
+                    await pool.expire(key, game)
+                except Exception:
+                    logger.exception(f"Не удалось завершить брошенную игру {pool.name} ({key})")
+        
+        return reaped
+    
+    def stats(self):
+        """Сколько игр каждого вида в памяти и сколько убрано"""
+        return {
+            pool.name: {'active': len(pool.games), 'expired': pool.expired, 'evicted': pool.evicted}
+            for pool in self._pools
+        }
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            reaped = await self.sweep()
+            if any(reaped.values()):
+                logger.info("Убраны брошенные игры: " + ', '.join(
+                    f"{name} {count}" for name, count in reaped.items() if count
+                ))
+
+reaper = GameReaper()
\ No newline at end of file
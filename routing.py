@@ -0,0 +1,119 @@
+# routing.py
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.filters import Filter
+from aiogram.types import Message, TelegramObject, Update
+
+# ========== МАРШРУТЫ ТЕКСТОВЫХ КОМАНД ==========
+
+ROUTE_ROULETTE = 'roulette'  # "рулетка ..."
+ROUTE_ROULETTE_BET = 'roulette_bet'  # ставки "100 красное" и го/лог/отмена
+ROUTE_COLOR = 'color'
+ROUTE_DICE = 'dice'
+ROUTE_MINES = 'mines'
+ROUTE_ADMIN_PLUS = 'admin_plus'  # "+сумма" и создание промокодов
+ROUTE_PURGE = 'purge'
+
+# Маршруты по началу текста. Если префиксы разных маршрутов пересекутся,
+# победит более короткий префикс, а у одинаковых префиксов - маршрут, указанный раньше
+PREFIX_ROUTES = {
+    ROUTE_ROULETTE: ('рулетка', 'roulette', 'рул', 'рлт'),
+    ROUTE_COLOR: ('красный', 'черный', 'ред', 'блек', 'red', 'black'),
+    ROUTE_DICE: ('кубик', 'dice', 'кости', 'кость'),
+    ROUTE_MINES: ('мины',),
+    ROUTE_ADMIN_PLUS: ('+',),
+}
+
+# Маршруты по всему тексту
+EXACT_ROUTES = {
+    'го': ROUTE_ROULETTE_BET, 'go': ROUTE_ROULETTE_BET,
+    'лог': ROUTE_ROULETTE_BET, 'log': ROUTE_ROULETTE_BET,
+    'отмена': ROUTE_ROULETTE_BET, 'стоп': ROUTE_ROULETTE_BET, 'stop': ROUTE_ROULETTE_BET,
+    'обнул': ROUTE_PURGE,
+}
+
+_TERMINAL = ''  # ключ маршрута в узле дерева, символ текста пустым не бывает
+
+def build_prefix_trie(prefix_routes):
+    """Собирает префиксное дерево: узел - словарь символ -> узел"""
+    root = {}
+    for route, prefixes in prefix_routes.items():
+        for prefix in prefixes:
+            node = root
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node.setdefault(_TERMINAL, route)
+    return root
+
+PREFIX_TRIE = build_prefix_trie(PREFIX_ROUTES)
+
+def resolve_route(text):
+    """Маршрут текста сообщения или None"""
+    if not text:
+        return None
+    text = text.lower().strip()
+    
+    route = EXACT_ROUTES.get(text)
+    if route is not None:
+        return route
+    
+    # Спуск по дереву останавливается на первом префиксе маршрута
+    node = PREFIX_TRIE
+    for char in text:
+        node = node.get(char)
+        if node is None:
+            break
+        route = node.get(_TERMINAL)
+        if route is not None:
+            return route
+    
+    # Ставка в рулетку: "100 красное"
+    if text[:1].isdigit() and ' ' in text:
+        return ROUTE_ROULETTE_BET
+    return None
+
+class TextRouter(BaseMiddleware):
+    """Внешний middleware на уровне обновлений: один раз определяет маршрут
+    текста и кладет его в data['route']. Фильтры Route и троттлинг берут
+    готовый маршрут вместо того, чтобы каждый раз проверять префиксы заново.
+    Заодно замеряет, сколько стоит маршрутизация"""
+    
+    def __init__(self):
+        self.routed = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+    
+    def get_stats(self):
+        """Статистика маршрутизации"""
+        return {
+            'routed': self.routed,
+            'avg_time': self.total_time / self.routed if self.routed else 0.0,
+            'max_time': self.max_time
+        }
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        if event.message is not None:
+            started = time.perf_counter()
+            data['route'] = resolve_route(event.message.text)
+            elapsed = time.perf_counter() - started
+            self.routed += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+        return await handler(event, data)
+
+class Route(Filter):
+    """Фильтр обработчика по маршруту, найденному TextRouter"""
+    
+    def __init__(self, route: str):
+        self.route = route
+    
+    async def __call__(self, message: Message, route: str = None) -> bool:
+        return route == self.route
+
+text_router = TextRouter()
\ No newline at end of file
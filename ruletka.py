@@ -1,15 +1,39 @@
 import random
 import asyncio
+import functools
+import json
+import logging
+import re
+import weakref
+from typing import NamedTuple, Optional
 from aiogram import Bot, Dispatcher
-from aiogram.types import Message
-from database import get_user_profile, update_user_balance, update_user_games_count
+from aiogram.types import Message, User
+from animations import animator
+from outbound import PRIORITY_HIGH
+from reaper import reaper
+from database import (
+    delete_active_game_async, get_user_profile_async, has_active_game_async, save_active_game_async,
+    settle_bet_async, settle_bets_async, update_active_game_async
+)
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 # Словарь для активных игр
 active_roulette_games = {}
 user_roulette_bets = {}
 roulette_history = []  # История последних выпавших чисел
 last_game_time = {}  # Время последней игры для каждого пользователя
+# Ставки, спин и отмена одного игрока идут по очереди под его замком,
+# поэтому запись ставки в базу не обгонит удаление рассчитанной игры.
+# Замок живет, пока его кто-то держит или ждет
+roulette_locks = weakref.WeakValueDictionary()  # user_id -> asyncio.Lock
+ROULETTE_COOLDOWN = 15  # секунд между спинами одного игрока
+
+# Общий стол в группах: один спин на чат раз в TABLE_ROUND_SECONDS секунд
+roulette_tables = {}  # chat_id -> раунд общего стола
+TABLE_ROUND_SECONDS = 20
+TABLE_RESULTS_SHOWN = 30  # сколько игроков перечислять в итогах раунда
 
 # Цвета чисел в рулетке
 ROULETTE_COLORS = {
@@ -24,6 +48,174 @@ ROULETTE_COLORS = {
     28: 'черный', 35: 'черный', 26: 'черный'
 }
 
+# Наборы чисел для ставок считаются один раз при загрузке модуля
+RED_NUMBERS = frozenset(n for n, color in ROULETTE_COLORS.items() if color == 'красный')
+BLACK_NUMBERS = frozenset(n for n, color in ROULETTE_COLORS.items() if color == 'черный')
+ODD_NUMBERS = frozenset(range(1, 37, 2))
+EVEN_NUMBERS = frozenset(range(2, 37, 2))
+LOW_NUMBERS = frozenset(range(1, 19))
+HIGH_NUMBERS = frozenset(range(19, 37))
+DOZENS = (frozenset(range(1, 13)), frozenset(range(13, 25)), frozenset(range(25, 37)))
+COLUMNS = (frozenset(range(3, 37, 3)), frozenset(range(2, 36, 3)), frozenset(range(1, 35, 3)))
+
+class BetSpec(NamedTuple):
+    """Разобранный тип ставки, без суммы. Неизменяемый, поэтому его можно кэшировать"""
+    type: str
+    name: str
+    numbers: frozenset
+    multiplier: float
+
+def make_bet(spec: BetSpec, amount: int) -> dict:
+    """Собирает ставку и сразу считает ее вектор выплат:
+    payouts[n] - сколько принесет ставка, если выпадет число n"""
+    win = amount * spec.multiplier
+    return {
+        'type': spec.type,
+        'name': spec.name,
+        'numbers': spec.numbers,
+        'amount': amount,
+        'multiplier': spec.multiplier,
+        'payouts': tuple(win if n in spec.numbers else 0 for n in range(37))
+    }
+
+# ========== РАЗБОР СТАВОК ==========
+# Грамматика ставок собирается один раз при загрузке модуля
+
+RED = BetSpec('red', 'красное', RED_NUMBERS, 2)
+BLACK = BetSpec('black', 'черное', BLACK_NUMBERS, 2)
+ODD = BetSpec('odd', 'нечетное', ODD_NUMBERS, 2)
+EVEN = BetSpec('even', 'четное', EVEN_NUMBERS, 2)
+LOW = BetSpec('low', '1-18', LOW_NUMBERS, 2)
+HIGH = BetSpec('high', '19-36', HIGH_NUMBERS, 2)
+DOZEN_BETS = tuple(BetSpec(f'dozen{i + 1}', name, DOZENS[i], 3) for i, name in enumerate(('1-12', '13-24', '25-36')))
+COLUMN_BETS = tuple(BetSpec(f'column{i + 1}', f'{i + 1} колонка', COLUMNS[i], 3) for i in range(3))
+
+# Точные написания ставок
+BET_ALIASES = {
+    **{str(n): BetSpec('single', f'число {n}', frozenset((n,)), 36) for n in range(37)},
+    **dict.fromkeys(('красное', 'красный', 'red', 'крас'), RED),
+    **dict.fromkeys(('черное', 'черный', 'black', 'черн', 'чёрное', 'чёрный'), BLACK),
+    **dict.fromkeys(('нечетное', 'нечет', 'odd', 'нечётное', 'нечёт'), ODD),
+    **dict.fromkeys(('четное', 'чет', 'even', 'чётное', 'чёт'), EVEN),
+    **dict.fromkeys(('1 18', '1/18', 'малое', 'малый'), LOW),
+    **dict.fromkeys(('19 36', '19/36', 'большое', 'большой'), HIGH),
+    **dict.fromkeys(('1 12', '1/12'), DOZEN_BETS[0]),
+    **dict.fromkeys(('13 24', '13/24'), DOZEN_BETS[1]),
+    **dict.fromkeys(('25 36', '25/36'), DOZEN_BETS[2]),
+    **dict.fromkeys(('первая колонка', 'колонка1'), COLUMN_BETS[0]),
+    **dict.fromkeys(('вторая колонка', 'колонка2'), COLUMN_BETS[1]),
+    **dict.fromkeys(('третья колонка', 'колонка3'), COLUMN_BETS[2]),
+}
+
+# Ключевые слова, которые могут стоять внутри текста ставки ("на красное").
+# Группы проверяются по порядку, как в прежней цепочке проверок: если в тексте
+# есть слова из нескольких групп, побеждает более ранняя группа ("чет красное" -
+# красное). "нечет" проверяется раньше "чет", потому что содержит его
+BET_KEYWORD_GROUPS = (
+    (('красное', 'красный', 'red', 'крас'), RED),
+    (('черное', 'черный', 'black', 'черн', 'чёрное', 'чёрный'), BLACK),
+    (('нечетное', 'нечет', 'odd', 'нечётное', 'нечёт'), ODD),
+    (('четное', 'чет', 'even', 'чётное', 'чёт'), EVEN),
+    (('первая колонка', 'колонка1'), COLUMN_BETS[0]),
+    (('вторая колонка', 'колонка2'), COLUMN_BETS[1]),
+    (('третья колонка', 'колонка3'), COLUMN_BETS[2]),
+)
+KEYWORD_RES = tuple(
+    (re.compile('|'.join(map(re.escape, keywords))), spec)
+    for keywords, spec in BET_KEYWORD_GROUPS
+)
+NUMBER_RE = re.compile(r'\d+')
+RANGE_RE = re.compile(r'\s*(\d+)\s*-\s*(\d+)\s*')  # прежний разбор допускал пробелы: "1 - 18"
+SPLIT_RE = re.compile(r'\s*\d+\s*(?:,\s*\d+\s*)+')
+
+@functools.lru_cache(maxsize=4096)
+def parse_bet(bet_type: str) -> Optional[BetSpec]:
+    """Разбирает тип ставки. Возвращает BetSpec или None, если ставка неизвестна"""
+    bet_type = bet_type.lower().strip()
+    spec = _parse_bet(bet_type)
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Ставка %r: %s", bet_type, spec.type if spec else "неизвестный тип")
+    return spec
+
+def _parse_bet(bet_type: str) -> Optional[BetSpec]:
+    spec = BET_ALIASES.get(bet_type)
+    if spec is not None:
+        return spec
+    
+    # Ставка на конкретное число, записанное не так, как в таблице ("07")
+    if NUMBER_RE.fullmatch(bet_type):
+        return BET_ALIASES.get(str(int(bet_type)))
+    
+    # Ставка на диапазон чисел
+    if '-' in bet_type:
+        match = RANGE_RE.fullmatch(bet_type)
+        if match:
+            start, end = int(match[1]), int(match[2])
+            if 1 <= start <= end <= 36:
+                numbers = range(start, end + 1)
+                return BetSpec('range', f'{start}-{end}', frozenset(numbers), round(36 / len(numbers), 1))
+        return None
+    
+    # Ставка на несколько чисел через запятую
+    if ',' in bet_type:
+        if not SPLIT_RE.fullmatch(bet_type):
+            return None
+        valid_numbers = [n for n in map(int, bet_type.split(',')) if 0 <= n <= 36]
+        if valid_numbers:
+            return BetSpec('split', ', '.join(map(str, valid_numbers)), frozenset(valid_numbers), round(36 / len(valid_numbers), 1))
+        return None
+    
+    for keyword_re, spec in KEYWORD_RES:
+        if keyword_re.search(bet_type):
+            return spec
+    return None
+
+def game_to_state(game: dict) -> str:
+    """Компактное состояние игры для таблицы active_games"""
+    user = game['user']
+    return json.dumps({
+        'u': [user.username, user.first_name],
+        'bal': game['balance'],
+        'tb': game['total_bet'],
+        't': game['start_time'].timestamp(),
+        'b': [
+            [bet['type'], bet['name'], sorted(bet['numbers']), bet['multiplier'], bet['amount']]
+            for bet in game['bets']
+        ]
+    }, ensure_ascii=False, separators=(',', ':'))
+
+def restore_roulette_game(user_id: int, state: str):
+    """Восстанавливает игру, сохраненную game_to_state"""
+    data = json.loads(state)
+    username, first_name = data['u']
+    bets = [
+        make_bet(BetSpec(bet_type, name, frozenset(numbers), multiplier), amount)
+        for bet_type, name, numbers, multiplier, amount in data['b']
+    ]
+    payouts = [0] * 37
+    for bet in bets:
+        payouts = [total + win for total, win in zip(payouts, bet['payouts'])]
+    
+    active_roulette_games[user_id] = {
+        'user': User(id=user_id, is_bot=False, first_name=first_name, username=username),
+        'balance': data['bal'],
+        'total_bet': data['tb'],
+        'start_time': datetime.fromtimestamp(data['t']),
+        'last_action': datetime.now(),
+        'bets': bets,
+        'payouts': payouts,
+        'status': 'betting'
+    }
+    user_roulette_bets[user_id] = list(bets)
+
+def roulette_lock(user_id: int) -> asyncio.Lock:
+    """Замок игры пользователя в рулетку"""
+    lock = roulette_locks.get(user_id)
+    if lock is None:
+        lock = roulette_locks[user_id] = asyncio.Lock()
+    return lock
+
 async def handle_roulette_game(bot: Bot, message: Message, dp: Dispatcher):
     """
     Главный обработчик рулетки
@@ -32,9 +224,9 @@ async def handle_roulette_game(bot: Bot, message: Message, dp: Dispatcher):
     user_id = user.id
     text = message.text.lower().strip()
     
-    # Если команда "го" - крутим рулетку
-    if text == "го" or text == "go":
-        await spin_roulette(user_id, message, bot)
+    # В группах играют за общим столом
+    if message.chat.type in ('group', 'supergroup'):
+        await handle_table_command(bot, message, text)
         return
     
     # Если команда "лог" - показываем историю выпавших чисел
@@ -42,14 +234,19 @@ async def handle_roulette_game(bot: Bot, message: Message, dp: Dispatcher):
         await show_history(user_id, message)
         return
     
-    # Если команда "отмена" - отменяем игру
-    if text == "отмена" or text == "стоп" or text == "stop":
-        await cancel_roulette_game(user_id, message)
-        return
-    
-    # Проверяем, является ли сообщение ставкой в формате: число тип_ставки
-    if await process_bet_command(user_id, message):
-        return
+    async with roulette_lock(user_id):
+        # Если команда "го" - крутим рулетку
+        if text == "го" or text == "go":
+            await spin_roulette(user_id, message, bot)
+            return
+        
+        # Если команда "отмена" - отменяем игру
+        if text == "отмена" or text == "стоп" or text == "stop":
+            await cancel_roulette_game(user_id, message)
+            return
+        
+        # Проверяем, является ли сообщение ставкой в формате: число тип_ставки
+        await process_bet_command(user_id, message)
 
 async def process_bet_command(user_id: int, message: Message) -> bool:
     """Обрабатывает команду ставки. Возвращает True если это была ставка."""
@@ -66,7 +263,7 @@ async def process_bet_command(user_id: int, message: Message) -> bool:
         
         # Если игры нет - начинаем новую
         if user_id not in active_roulette_games:
-            profile = get_user_profile(user_id)
+            profile = await get_user_profile_async(user_id)
             if not profile:
                 await message.answer("❌ Сначала запустите бота командой /start")
                 return True
@@ -81,7 +278,9 @@ async def process_bet_command(user_id: int, message: Message) -> bool:
                 'balance': profile['stars_balance'],
                 'total_bet': 0,
                 'start_time': datetime.now(),
+                'last_action': datetime.now(),
                 'bets': [],
+                'payouts': [0] * 37,  # суммарная выплата раунда по каждому числу
                 'status': 'betting'
             }
             user_roulette_bets[user_id] = []
@@ -108,19 +307,29 @@ async def process_bet_command(user_id: int, message: Message) -> bool:
             return True
         
         # Обрабатываем ставку
-        bet_info = await parse_bet(bet_type, amount)
+        spec = parse_bet(bet_type)
         
-        if not bet_info:
+        if not spec:
             await message.answer("❌ Неизвестный тип ставки!")
             return True
         
+        bet_info = make_bet(spec, amount)
+        
         # Списываем деньги с виртуального баланса
         game['balance'] -= amount
         game['total_bet'] += amount
+        game['last_action'] = datetime.now()
         
-        # Добавляем ставку
+        # Добавляем ставку и ее выплаты в вектор раунда
         game['bets'].append(bet_info)
+        game['payouts'] = [total + win for total, win in zip(game['payouts'], bet_info['payouts'])]
         user_roulette_bets[user_id].append(bet_info)
+        # Первая ставка создает запись игры, следующие только обновляют ее:
+        # если игры в базе уже нет, ставка ее не воскресит
+        if len(game['bets']) == 1:
+            await save_active_game_async('roulette', user_id, game_to_state(game))
+        elif not await update_active_game_async('roulette', user_id, game_to_state(game)):
+            logger.warning(f"Игры в рулетку {user_id} нет в базе, ставка не сохранена")
         
         # Короткий ответ о принятии ставки
         await message.answer(f"✅ Ставка принята: {amount}⭐ на {bet_info['name']}")
@@ -130,209 +339,6 @@ async def process_bet_command(user_id: int, message: Message) -> bool:
     
     return True
 
-async def parse_bet(bet_type: str, amount: int) -> dict:
-    """Парсит тип ставки и возвращает информацию о ней"""
-    bet_type = bet_type.lower().strip()
-    
-    print(f"DEBUG: Парсим ставку '{bet_type}', сумма {amount}")  # Добавьте для отладки
-    
-    # Ставка на конкретное число
-    if bet_type.isdigit():
-        number = int(bet_type)
-        if 0 <= number <= 36:
-            print(f"DEBUG: Ставка на число {number}")
-            return {
-                'type': 'single',
-                'name': f'число {number}',
-                'numbers': [number],
-                'amount': amount,
-                'multiplier': 36
-            }
-    
-    # Ставка на диапазон чисел
-    elif '-' in bet_type:
-        try:
-            start_end = bet_type.split('-')
-            if len(start_end) == 2:
-                start, end = int(start_end[0]), int(start_end[1])
-                if 1 <= start <= end <= 36:
-                    numbers = list(range(start, end + 1))
-                    multiplier = 36 / len(numbers)
-                    print(f"DEBUG: Ставка на диапазон {start}-{end}")
-                    return {
-                        'type': 'range',
-                        'name': f'{start}-{end}',
-                        'numbers': numbers,
-                        'amount': amount,
-                        'multiplier': round(multiplier, 1)
-                    }
-        except:
-            pass
-    
-    # Ставка на несколько чисел через запятую
-    elif ',' in bet_type:
-        try:
-            numbers = [int(n.strip()) for n in bet_type.split(',')]
-            valid_numbers = [n for n in numbers if 0 <= n <= 36]
-            if valid_numbers:
-                multiplier = 36 / len(valid_numbers)
-                print(f"DEBUG: Ставка на несколько чисел {valid_numbers}")
-                return {
-                    'type': 'split',
-                    'name': f'{", ".join(map(str, valid_numbers))}',
-                    'numbers': valid_numbers,
-                    'amount': amount,
-                    'multiplier': round(multiplier, 1)
-                }
-        except:
-            pass
-    
-    # Ставка на красное
-    elif any(word in bet_type for word in ['красное', 'красный', 'red', 'крас']):
-        numbers = [n for n, color in ROULETTE_COLORS.items() if color == 'красный']
-        print(f"DEBUG: Ставка на красное, чисел: {len(numbers)}")
-        return {
-            'type': 'red',
-            'name': 'красное',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 2
-        }
-    
-    # Ставка на черное
-    elif any(word in bet_type for word in ['черное', 'черный', 'black', 'черн', 'чёрное', 'чёрный']):
-        numbers = [n for n, color in ROULETTE_COLORS.items() if color == 'черный']
-        print(f"DEBUG: Ставка на черное, чисел: {len(numbers)}")
-        return {
-            'type': 'black',
-            'name': 'черное',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 2
-        }
-    
-    # СНАЧАЛА проверяем "нечетное", ПОТОМ "четное" - ВАЖНО!
-    # Ставка на нечетное
-    elif any(word in bet_type for word in ['нечетное', 'нечет', 'odd', 'нечётное', 'нечёт']):
-        # Нечетные числа: 1, 3, 5, ..., 35
-        numbers = [n for n in range(1, 37, 2)]
-        print(f"DEBUG: Ставка на НЕЧЕТНОЕ, чисел: {len(numbers)}: {numbers[:5]}...")
-        return {
-            'type': 'odd',
-            'name': 'нечетное',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 2
-        }
-    
-    # Ставка на четное
-    elif any(word in bet_type for word in ['четное', 'чет', 'even', 'чётное', 'чёт']):
-        # Четные числа: 2, 4, 6, ..., 36
-        numbers = [n for n in range(2, 37, 2)]
-        print(f"DEBUG: Ставка на ЧЕТНОЕ, чисел: {len(numbers)}: {numbers[:5]}...")
-        return {
-            'type': 'even',
-            'name': 'четное',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 2
-        }
-    
-    # Ставка на 1-18
-    elif bet_type in ['1-18', '1 18', '1/18', 'малое', 'малый']:
-        numbers = list(range(1, 19))
-        print(f"DEBUG: Ставка на 1-18")
-        return {
-            'type': 'low',
-            'name': '1-18',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 2
-        }
-    
-    # Ставка на 19-36
-    elif bet_type in ['19-36', '19 36', '19/36', 'большое', 'большой']:
-        numbers = list(range(19, 37))
-        print(f"DEBUG: Ставка на 19-36")
-        return {
-            'type': 'high',
-            'name': '19-36',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 2
-        }
-    
-    # Ставка на дюжины
-    elif bet_type in ['1-12', '1 12', '1/12']:
-        numbers = list(range(1, 13))
-        print(f"DEBUG: Ставка на 1-12")
-        return {
-            'type': 'dozen1',
-            'name': '1-12',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 3
-        }
-    
-    elif bet_type in ['13-24', '13 24', '13/24']:
-        numbers = list(range(13, 25))
-        print(f"DEBUG: Ставка на 13-24")
-        return {
-            'type': 'dozen2',
-            'name': '13-24',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 3
-        }
-    
-    elif bet_type in ['25-36', '25 36', '25/36']:
-        numbers = list(range(25, 37))
-        print(f"DEBUG: Ставка на 25-36")
-        return {
-            'type': 'dozen3',
-            'name': '25-36',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 3
-        }
-    
-    # Ставка на колонки
-    elif any(word in bet_type for word in ['первая колонка', 'колонка1']):
-        numbers = [3, 6, 9, 12, 15, 18, 21, 24, 27, 30, 33, 36]
-        print(f"DEBUG: Ставка на 1 колонку")
-        return {
-            'type': 'column1',
-            'name': '1 колонка',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 3
-        }
-    
-    elif any(word in bet_type for word in ['вторая колонка', 'колонка2']):
-        numbers = [2, 5, 8, 11, 14, 17, 20, 23, 26, 29, 32, 35]
-        print(f"DEBUG: Ставка на 2 колонку")
-        return {
-            'type': 'column2',
-            'name': '2 колонка',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 3
-        }
-    
-    elif any(word in bet_type for word in ['третья колонка', 'колонка3']):
-        numbers = [1, 4, 7, 10, 13, 16, 19, 22, 25, 28, 31, 34]
-        print(f"DEBUG: Ставка на 3 колонку")
-        return {
-            'type': 'column3',
-            'name': '3 колонка',
-            'numbers': numbers,
-            'amount': amount,
-            'multiplier': 3
-        }
-    
-    print(f"DEBUG: Неизвестный тип ставки: '{bet_type}'")
-    return None
-
 async def show_history(user_id: int, message: Message):
     """Показывает историю выпавших чисел"""
     if not roulette_history:
@@ -355,7 +361,7 @@ async def cancel_roulette_game(user_id: int, message: Message):
         return
     
     game = active_roulette_games[user_id]
-    profile = get_user_profile(user_id)
+    profile = await get_user_profile_async(user_id)
     
     if game['total_bet'] > 0:
         await message.answer(f"""❌ ИГРА ОТМЕНЕНА
@@ -371,14 +377,48 @@ async def cancel_roulette_game(user_id: int, message: Message):
         del active_roulette_games[user_id]
     if user_id in user_roulette_bets:
         del user_roulette_bets[user_id]
+    await delete_active_game_async('roulette', user_id)
+
+async def expire_roulette_game(user_id: int, game: dict):
+    """Убирает брошенную игру. Ставки списываются только при спине, возвращать нечего"""
+    async with roulette_lock(user_id):
+        # Пока ждали замок, игрок мог начать новую игру - ее не трогаем
+        if user_id in active_roulette_games:
+            return
+        user_roulette_bets.pop(user_id, None)
+        await delete_active_game_async('roulette', user_id)
+
+reaper.register('roulette', active_roulette_games, last_action=lambda game: game['last_action'], expire=expire_roulette_game)
+# Время последней игры нужно только на время задержки между спинами
+reaper.register('roulette_cooldown', last_game_time, ttl=ROULETTE_COOLDOWN, cap=None, last_action=lambda last: last)
+
+# Кадры анимации вращения: (секунда от начала, текст), итог показывается через SPIN_DURATION
+SPIN_FRAMES = [
+    (0, "🎰 <b>Р У Л Е Т К А</b> • Вращается..."),
+    (1.0, "🎰 <b>Р У Л Е Т К А</b> • Вращается!"),
+    (1.7, "🎰 <b>Р У Л Е Т К А</b> • Вращается!!"),
+    (2.4, "🎰 <b>Р У Л Е Т К А</b> • Вращается!!!"),
+]
+SPIN_DURATION = 5.1
+
+def draw_number():
+    """Выбрасывает случайное число и записывает его в историю"""
+    winning_number = random.randint(0, 36)
+    winning_color = ROULETTE_COLORS[winning_number]
+    
+    roulette_history.append((winning_number, winning_color))
+    if len(roulette_history) > 100:
+        roulette_history.pop(0)
+    
+    return winning_number, winning_color
 
 async def spin_roulette(user_id: int, message: Message, bot: Bot):
     """Запускает вращение рулетки"""
     # Проверяем задержку между играми
     if user_id in last_game_time:
         time_since_last_game = datetime.now() - last_game_time[user_id]
-        if time_since_last_game < timedelta(seconds=15):
-            wait_time = 15 - time_since_last_game.seconds
+        if time_since_last_game < timedelta(seconds=ROULETTE_COOLDOWN):
+            wait_time = ROULETTE_COOLDOWN - time_since_last_game.seconds
             await message.answer(f"⏳ Подождите {wait_time} секунд перед запуском!")
             return
     
@@ -398,77 +438,46 @@ async def spin_roulette(user_id: int, message: Message, bot: Bot):
     
     # Меняем статус
     game['status'] = 'spinning'
+    game['last_action'] = datetime.now()
     
-    # Анимация вращения
-    animation = await message.answer("🎰 <b>Р У Л Е Т К А</b> • Вращается...")
-    await asyncio.sleep(1)
-    
-    for i in range(3):
-        await bot.edit_message_text(
-            chat_id=message.chat.id,
-            message_id=animation.message_id,
-            text=f"🎰 <b>Р У Л Е Т К А</b> • Вращается{'!' * (i+1)}"
-        )
-        await asyncio.sleep(0.7)
-    
-    await asyncio.sleep(2)
-    
-    # Выпадает случайное число
-    winning_number = random.randint(0, 36)
-    winning_color = ROULETTE_COLORS[winning_number]
-    
-    # Добавляем в историю
-    roulette_history.append((winning_number, winning_color))
-    if len(roulette_history) > 100:
-        roulette_history.pop(0)
+    # Результат известен сразу, анимация только показывает его
+    winning_number, winning_color = draw_number()
     
     # Сохраняем время окончания игры
     last_game_time[user_id] = datetime.now()
     
-    # Определяем параметры выигрышного числа
-    # 0 - не считается ни четным, ни нечетным в рулетке
-    is_even = winning_number % 2 == 0 and winning_number != 0
-    is_odd = winning_number % 2 == 1 and winning_number != 0
-    is_red = winning_color == 'красный'
-    is_black = winning_color == 'черный'
+    # Выигрыш раунда уже посчитан для каждого числа, остается взять его по индексу
+    total_win = game['payouts'][winning_number]
+    bet_lines = [(bet['amount'], bet['payouts'][winning_number]) for bet in game['bets']]  # для статистики
     
-    # Обрабатываем все ставки
-    total_win = 0
+    # Под замком игрока запись игры не может пропасть между проверкой и расчетом.
+    # Если ее нет, ставки не сохранились - рассчитывать нечего
+    saved = await has_active_game_async('roulette', user_id)
     
-    for bet in game['bets']:
-        is_win = False
-        
-        # Проверяем, выиграла ли ставка
-        if bet['type'] in ['single', 'range', 'split']:
-            is_win = (winning_number in bet['numbers'])
-        elif bet['type'] == 'red':
-            is_win = is_red
-        elif bet['type'] == 'black':
-            is_win = is_black
-        elif bet['type'] == 'even':
-            is_win = is_even
-        elif bet['type'] == 'odd':
-            is_win = is_odd
-        elif bet['type'] in ['low', 'high', 'dozen1', 'dozen2', 'dozen3', 'column1', 'column2', 'column3']:
-            is_win = (winning_number in bet['numbers'])
-        
-        if is_win:
-            win_amount = bet['amount'] * bet['multiplier']
-            total_win += win_amount
+    # Рассчитываем все ставки раунда одной транзакцией
+    new_balance = None
+    if saved:
+        new_balance = await settle_bet_async(
+            user_id, 'roulette', game['total_bet'], total_win, lines=bet_lines, finish_game='roulette'
+        )
     
-    # Обновляем реальный баланс пользователя
-    profile = get_user_profile(user_id)
-    if profile:
-        net_win = total_win - game['total_bet']
-        update_user_balance(user_id, net_win)
-        update_user_games_count(user_id)
+    # Очищаем данные игры
+    if user_id in active_roulette_games:
+        del active_roulette_games[user_id]
+    if user_id in user_roulette_bets:
+        del user_roulette_bets[user_id]
     
-    # Получаем новый баланс
-    new_profile = get_user_profile(user_id)
-    new_balance = new_profile['stars_balance'] if new_profile else 0
+    if not saved:
+        logger.warning(f"Игры в рулетку {user_id} нет в базе, раунд отменен")
+        await message.answer("❌ Ставки раунда не сохранились, игра отменена. Деньги не списаны.")
+        return
+    
+    if new_balance is None:
+        animator.play(message.chat.id, SPIN_FRAMES, "❌ Недостаточно средств на балансе. Ставки отменены.", SPIN_DURATION)
+        return
     
     # Формируем эмодзи цвета
-    color_emoji = "🟢" if winning_color == 'зеленый' else "🔴" if is_red else "⚫"
+    color_emoji = "🟢" if winning_color == 'зеленый' else "🔴" if winning_number in RED_NUMBERS else "⚫"
     
     # Формируем результат в нужном формате
     result_text = f"""
@@ -480,16 +489,178 @@ async def spin_roulette(user_id: int, message: Message, bot: Bot):
 ├ 💸 Всего ставок: {game['total_bet']}⭐
 └ 🏦 Баланс: {new_balance}⭐</blockquote>"""
     
-    # Отправляем результат
-    await bot.edit_message_text(
-        chat_id=message.chat.id,
-        message_id=animation.message_id,
-        text=result_text,
-        parse_mode='HTML'
-    )
+    # Анимация и результат показываются в фоне, обработчик освобождается сразу
+    animator.play(message.chat.id, SPIN_FRAMES, result_text, SPIN_DURATION)
+
+# ========== ОБЩИЙ СТОЛ ==========
+
+def player_name(user) -> str:
+    return f"@{user.username}" if user.username else user.first_name
+
+async def handle_table_command(bot: Bot, message: Message, text: str):
+    """Команды рулетки в группе: ставки всех игроков идут в общий раунд чата"""
+    if text == "лог" or text == "log":
+        await show_history(message.from_user.id, message)
+        return
+    
+    table = roulette_tables.get(message.chat.id)
     
-    # Очищаем данные игры
-    if user_id in active_roulette_games:
-        del active_roulette_games[user_id]
-    if user_id in user_roulette_bets:
-        del user_roulette_bets[user_id]
\ No newline at end of file
+    if text == "го" or text == "go":
+        if table is None:
+            await message.answer("❌ Сначала сделайте ставку!\nПример: <code>100 красное</code>")
+        elif table['status'] == 'betting':
+            seconds_left = max(0, int((table['spin_at'] - datetime.now()).total_seconds()))
+            await message.answer(f"⏳ Общий стол: спин через {seconds_left} сек.")
+        return
+    
+    if text == "отмена" or text == "стоп" or text == "stop":
+        await cancel_table_bets(message, table)
+        return
+    
+    parts = text.split()
+    if len(parts) < 2:
+        return
+    try:
+        amount = int(parts[0])
+    except ValueError:
+        return
+    
+    await place_table_bet(bot, message, amount, ' '.join(parts[1:]))
+
+async def place_table_bet(bot: Bot, message: Message, amount: int, bet_type: str):
+    """Принимает ставку игрока в текущий раунд общего стола"""
+    user = message.from_user
+    chat_id = message.chat.id
+    table = roulette_tables.get(chat_id)
+    
+    if table is not None and table['status'] != 'betting':
+        await message.answer("❌ Рулетка уже вращается, ставка пойдет в следующий раунд")
+        return
+    
+    player = table['players'].get(user.id) if table else None
+    
+    if player is None:
+        profile = await get_user_profile_async(user.id)
+        if not profile:
+            await message.answer("❌ Сначала запустите бота командой /start")
+            return
+        if profile['stars_balance'] < 10:
+            await message.answer("❌ Минимальный баланс для игры - 10⭐")
+            return
+        player = {
+            'user': user,
+            'balance': profile['stars_balance'],
+            'total_bet': 0,
+            'bets': [],
+            'payouts': [0] * 37
+        }
+    
+    if amount < 10:
+        await message.answer("❌ Минимальная ставка - 10⭐")
+        return
+    
+    if amount > player['balance']:
+        await message.answer(f"❌ Недостаточно средств!\nБаланс: {player['balance']}⭐")
+        return
+    
+    if len(player['bets']) >= 16:
+        await message.answer("❌ Достигнут лимит - 16 ставок за раунд")
+        return
+    
+    spec = parse_bet(bet_type)
+    if not spec:
+        await message.answer("❌ Неизвестный тип ставки!")
+        return
+    bet_info = make_bet(spec, amount)
+    
+    # Пока игрок ждал профиль, раунд мог начаться или закончиться
+    table = roulette_tables.get(chat_id)
+    if table is None:
+        table = roulette_tables[chat_id] = {
+            'players': {},
+            'spin_at': datetime.now() + timedelta(seconds=TABLE_ROUND_SECONDS),
+            'status': 'betting'
+        }
+        asyncio.create_task(run_table_round(bot, chat_id))
+    elif table['status'] != 'betting':
+        await message.answer("❌ Рулетка уже вращается, ставка пойдет в следующий раунд")
+        return
+    
+    player = table['players'].setdefault(user.id, player)
+    player['balance'] -= amount
+    player['total_bet'] += amount
+    player['bets'].append(bet_info)
+    player['payouts'] = [total + win for total, win in zip(player['payouts'], bet_info['payouts'])]
+    
+    seconds_left = max(0, int((table['spin_at'] - datetime.now()).total_seconds()))
+    await message.answer(f"✅ Ставка принята: {amount}⭐ на {bet_info['name']}\n⏳ Спин через {seconds_left} сек.")
+
+async def cancel_table_bets(message: Message, table):
+    """Снимает ставки игрока с общего стола, пока рулетка не вращается"""
+    user_id = message.from_user.id
+    
+    if table is None or user_id not in table['players']:
+        await message.answer("❌ У вас нет ставок в этом раунде")
+        return
+    
+    if table['status'] != 'betting':
+        await message.answer("❌ Нельзя отменить ставки во время вращения рулетки")
+        return
+    
+    # Деньги списываются только при расчете раунда, возвращать нечего
+    player = table['players'].pop(user_id)
+    await message.answer(f"✅ Ставки сняты: {player['total_bet']}⭐")
+
+async def run_table_round(bot: Bot, chat_id: int):
+    """Раунд общего стола: ждет ставки, один раз крутит рулетку
+    и рассчитывает всех игроков одной транзакцией"""
+    await asyncio.sleep(TABLE_ROUND_SECONDS)
+    table = roulette_tables[chat_id]
+    table['status'] = 'spinning'
+    
+    try:
+        players = table['players']
+        if not players:
+            return
+        
+        winning_number, winning_color = draw_number()
+        
+        rounds = [
+            (
+                user_id,
+                'roulette',
+                player['total_bet'],
+                player['payouts'][winning_number],
+                [(bet['amount'], bet['payouts'][winning_number]) for bet in player['bets']]
+            )
+            for user_id, player in players.items()
+        ]
+        balances = await settle_bets_async(rounds)
+        
+        # Сначала самые крупные выигрыши и проигрыши
+        results = sorted(rounds, key=lambda r: abs(r[3] - r[2]), reverse=True)
+        lines = []
+        for user_id, game_type, total_bet, total_win, bet_lines in results[:TABLE_RESULTS_SHOWN]:
+            name = player_name(players[user_id]['user'])
+            if balances[user_id] is None:
+                lines.append(f"├ {name}: ❌ недостаточно средств, ставки отменены")
+            else:
+                net = total_win - total_bet
+                lines.append(f"├ {name}: {'+' if net > 0 else ''}{net}⭐ (баланс {balances[user_id]}⭐)")
+        if len(results) > TABLE_RESULTS_SHOWN:
+            lines.append(f"├ ...и еще {len(results) - TABLE_RESULTS_SHOWN} игроков")
+        
+        color_emoji = "🟢" if winning_color == 'зеленый' else "🔴" if winning_number in RED_NUMBERS else "⚫"
+        results_text = '\n'.join(lines)
+        result_text = f"""
+🎰 <b>Р У Л Е Т К А</b> • Общий стол
+<blockquote>📊 <b>ИТОГ:</b>
+├ 🎲 Выпало: {winning_number} {color_emoji}
+{results_text}
+└ 👥 Игроков: {len(results)}</blockquote>"""
+        
+        # В группе действует общий лимит сообщений, и в очереди могут стоять
+        # подтверждения ставок следующего раунда - итог отправляем раньше них
+        animator.play(chat_id, SPIN_FRAMES, result_text, SPIN_DURATION, result_priority=PRIORITY_HIGH)
+    finally:
+        roulette_tables.pop(chat_id, None)
\ No newline at end of file
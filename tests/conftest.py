@@ -0,0 +1,16 @@
+# tests/conftest.py
+import pytest
+import database
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Чистая база во временной папке: свой пул соединений, кэши и буфер"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, '_pool', database.ConnectionPool(database.DB_NAME))
+    monkeypatch.setattr(database, '_profile_cache', database.ProfileCache())
+    monkeypatch.setattr(database, '_write_behind', database.WriteBehindBuffer())
+    monkeypatch.setattr(database, '_banned_users', {})
+    monkeypatch.setattr(database, '_bans_loaded', False)
+    database.init_db()
+    yield database
+    database._pool.close_all()
\ No newline at end of file
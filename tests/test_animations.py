@@ -0,0 +1,78 @@
+# tests/test_animations.py
+import asyncio
+import time
+import animations
+from animations import AnimationScheduler
+from outbound import PRIORITY_HIGH, OutboundQueue, TokenBucket, outbound_priority
+
+GROUP_CHAT = -100
+
+class QueuedBot:
+    """Бот, который перед каждой отправкой ждет очередь исходящих, как OutboundMiddleware"""
+    
+    def __init__(self, queue):
+        self.queue = queue
+        self.sent = []  # (текст, через сколько секунд от старта ушел)
+        self.started = time.monotonic()
+    
+    async def _send(self, chat_id, text):
+        await self.queue.acquire(chat_id, outbound_priority.get())
+        self.sent.append((text, time.monotonic() - self.started))
+    
+    async def send_message(self, chat_id, text):
+        await self._send(chat_id, text)
+        
+        class Sent:
+            message_id = len(self.sent)
+        return Sent()
+    
+    async def edit_message_text(self, text, chat_id, message_id):
+        await self._send(chat_id, text)
+
+def test_group_frames_do_not_delay_result(monkeypatch):
+    """Когда у группы нет токена, промежуточные кадры пропускаются,
+    а итог уходит с первым освободившимся токеном"""
+    queue = OutboundQueue()
+    queue._chats[GROUP_CHAT] = TokenBucket(2, 1)  # токен раз в 0.5 сек.
+    queue._chats[GROUP_CHAT].consume()  # ведро уже выбрано подтверждениями ставок
+    monkeypatch.setattr(animations, 'outbound', queue)
+    
+    async def run():
+        bot = QueuedBot(queue)
+        scheduler = AnimationScheduler(chat_interval=0)
+        scheduler.start(bot)
+        scheduler.play(GROUP_CHAT, [(0, 'f1'), (0.1, 'f2'), (0.2, 'f3')], 'result', 0.3, result_priority=PRIORITY_HIGH)
+        await asyncio.sleep(1)
+        await scheduler.stop()
+        return bot.sent, scheduler.frames_dropped
+    
+    sent, dropped = asyncio.run(run())
+    
+    assert [text for text, at in sent] == ['result']
+    assert sent[0][1] < 0.7
+    assert dropped >= 3
+
+def test_stop_waits_for_frames_in_flight():
+    """stop() дожидается кадров, которые уже отправляются"""
+    class SlowBot:
+        def __init__(self):
+            self.sent = []
+        
+        async def send_message(self, chat_id, text):
+            await asyncio.sleep(0.2)
+            self.sent.append(text)
+            
+            class Sent:
+                message_id = 1
+            return Sent()
+    
+    async def run():
+        bot = SlowBot()
+        scheduler = AnimationScheduler()
+        scheduler.start(bot)
+        scheduler.play(1, [], 'result', 0)
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return bot.sent
+    
+    assert asyncio.run(run()) == ['result']
\ No newline at end of file
@@ -0,0 +1,65 @@
+# tests/test_keyboards.py
+import timeit
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+import keyboards
+
+def legacy_menu_keyboard():
+    """Прежнее главное меню: собиралось заново на каждый вызов"""
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="👤 Профиль")],
+            [KeyboardButton(text="🎟️ Промокод"), KeyboardButton(text="🎮 Игры")],
+            [KeyboardButton(text="ℹ️ О нас"), KeyboardButton(text="🆘 Поддержка"), KeyboardButton(text="📖 Как играть?")]
+        ],
+        resize_keyboard=True
+    )
+
+def legacy_admin_profile_actions_keyboard(user_id, is_banned=False):
+    """Прежняя клавиатура действий с профилем"""
+    if is_banned:
+        second = InlineKeyboardButton(text="✅ Разбанить", callback_data=f"admin_unban_confirm_{user_id}")
+    else:
+        second = InlineKeyboardButton(text="🔨 Забанить", callback_data=f"admin_ban_confirm_{user_id}")
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="💰 Изменить баланс", callback_data=f"admin_edit_balance_{user_id}"), second],
+        [InlineKeyboardButton(text="📋 История операций", callback_data=f"admin_user_history_{user_id}")],
+        [InlineKeyboardButton(text="🔙 Назад к админке", callback_data="admin_back_to_main")]
+    ])
+
+def test_keyboards_match_legacy():
+    """Общие и закэшированные клавиатуры совпадают с прежними"""
+    assert keyboards.create_menu_keyboard().model_dump() == legacy_menu_keyboard().model_dump()
+    for is_banned in (False, True):
+        assert (
+            keyboards.create_admin_profile_actions_keyboard(42, is_banned).model_dump()
+            == legacy_admin_profile_actions_keyboard(42, is_banned).model_dump()
+        )
+
+def test_static_keyboards_are_shared():
+    """Функции create_* отдают один и тот же объект"""
+    factories = [
+        keyboards.create_menu_keyboard, keyboards.create_profile_keyboard, keyboards.create_promo_keyboard,
+        keyboards.create_withdraw_keyboard, keyboards.create_admin_main_keyboard,
+        keyboards.create_admin_manage_keyboard, keyboards.create_admin_back_keyboard,
+    ]
+    for factory in factories:
+        assert factory() is factory()
+    assert keyboards.create_ban_confirmation_keyboard(7) is keyboards.create_ban_confirmation_keyboard(7)
+    assert keyboards.create_withdraw_admin_keyboard(3) is not keyboards.create_withdraw_admin_keyboard(4)
+
+def test_keyboard_factories_benchmark():
+    """Общая клавиатура и кэш фабрики быстрее сборки заново"""
+    number = 2000
+    
+    def per_call(func):
+        return timeit.timeit(func, number=number) / number * 1e6
+    
+    legacy_menu = per_call(legacy_menu_keyboard)
+    shared_menu = per_call(keyboards.create_menu_keyboard)
+    legacy_actions = per_call(lambda: legacy_admin_profile_actions_keyboard(42))
+    cached_actions = per_call(lambda: keyboards.create_admin_profile_actions_keyboard(42))
+    print(f"\nМеню, мкс: прежнее {legacy_menu:.2f}, общее {shared_menu:.2f}; "
+          f"действия с профилем, мкс: прежние {legacy_actions:.2f}, из кэша {cached_actions:.2f}")
+    
+    assert shared_menu * 10 < legacy_menu
+    assert cached_actions * 10 < legacy_actions
\ No newline at end of file
@@ -0,0 +1,156 @@
+# tests/test_mines.py
+import random
+import timeit
+import tracemalloc
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from mines import DEFAULT_VARIANT, MinesGame, field_row
+
+class LegacyMinesGame:
+    """Прежняя игра в мины на множествах позиций (без сообщений и клавиатуры), для сравнения"""
+    
+    def __init__(self, user_id, bet_amount, mine_positions):
+        self.user_id = user_id
+        self.bet_amount = bet_amount
+        self.grid_size = 5
+        self.mines_count = 6
+        self.opened_cells = 0
+        self.multiplier = 1.00
+        self.game_over = False
+        self.game_won = False
+        self.current_multiplier = 1.00
+        self.opened_positions = set()
+        self.mine_positions = set(mine_positions)
+        self.start_time = random.random()
+    
+    def open_cell(self, x, y):
+        position = (x, y)
+        if position in self.opened_positions:
+            return None
+        if position in self.mine_positions:
+            self.game_over = True
+            return 'mine'
+        self.opened_positions.add(position)
+        self.opened_cells += 1
+        if self.opened_cells == self.grid_size * self.grid_size - self.mines_count:
+            self.game_over = True
+            self.game_won = True
+            return 'win'
+        return 'safe'
+
+def mine_positions(game):
+    grid = game.variant.grid
+    return {(cell // grid, cell % grid) for cell in range(game.variant.cells) if game.mines >> cell & 1}
+
+def play_both(rng):
+    game = MinesGame(1, 100)
+    legacy = LegacyMinesGame(1, 100, mine_positions(game))
+    cells = [(i, j) for i in range(5) for j in range(5)]
+    clicks = rng.choices(cells, k=rng.randint(1, 30))
+    return game, legacy, clicks
+
+def test_bitboard_matches_legacy_game():
+    """Битовые маски дают те же исходы кликов, что и множества позиций"""
+    rng = random.Random(7)
+    random.seed(7)
+    for _ in range(2000):
+        game, legacy, clicks = play_both(rng)
+        for x, y in clicks:
+            if legacy.game_over:
+                break
+            result = game.open_cell(x, y)
+            kind = result[0] if isinstance(result, tuple) else result
+            assert kind == legacy.open_cell(x, y)
+            assert game.opened_cells == legacy.opened_cells
+            assert game.game_over == legacy.game_over
+        assert game.game_won == legacy.game_won
+
+def test_bitboard_memory_benchmark():
+    """Игра на битовых масках занимает в разы меньше памяти"""
+    count = 5000
+    
+    def measure(make):
+        tracemalloc.start()
+        games = [make() for _ in range(count)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return size / len(games)
+    
+    def make_game():
+        game = MinesGame(1, 100)
+        for cell in range(3):
+            game.open_cell(cell, cell)
+        return game
+    
+    def make_legacy():
+        legacy = LegacyMinesGame(1, 100, random.sample([(i, j) for i in range(5) for j in range(5)], DEFAULT_VARIANT.mines))
+        for cell in range(3):
+            legacy.open_cell(cell, cell)
+        return legacy
+    
+    legacy = measure(make_legacy)
+    bitboard = measure(make_game)
+    print(f"\nБайт на игру: прежняя {legacy:.0f}, на битовых масках {bitboard:.0f}")
+    
+    assert bitboard * 3 < legacy
+
+def legacy_field_display(legacy):
+    """Прежняя сборка поля: каждая кнопка и разметка создаются заново на каждый клик"""
+    buttons = []
+    for i in range(legacy.grid_size):
+        row_buttons = []
+        for j in range(legacy.grid_size):
+            position = (i, j)
+            if position in legacy.opened_positions:
+                if position in legacy.mine_positions and legacy.game_over:
+                    row_buttons.append(InlineKeyboardButton(text="💣", callback_data=f"mines_opened_{i}_{j}"))
+                else:
+                    row_buttons.append(InlineKeyboardButton(text="✅", callback_data=f"mines_opened_{i}_{j}"))
+            else:
+                row_buttons.append(InlineKeyboardButton(text="❓", callback_data=f"mines_open_{i}_{j}"))
+        buttons.append(row_buttons)
+    
+    if legacy.opened_cells > 0:
+        buttons.append([InlineKeyboardButton(text="💎 Забрать выигрыш", callback_data="mines_cashout")])
+    else:
+        buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="mines_cancel")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def random_boards(count):
+    rng = random.Random(11)
+    random.seed(11)
+    boards = []
+    for _ in range(count):
+        game, legacy, clicks = play_both(rng)
+        for x, y in clicks:
+            if legacy.game_over:
+                break
+            game.open_cell(x, y)
+            legacy.open_cell(x, y)
+        boards.append((game, legacy))
+    return boards
+
+def test_cached_field_matches_legacy_markup():
+    """Поле из общих кнопок и рядов сериализуется так же, как прежнее"""
+    for game, legacy in random_boards(300):
+        markup = game.get_field_display()
+        assert markup.model_dump(exclude_none=True) == legacy_field_display(legacy).model_dump(exclude_none=True)
+        assert all(type(row) is list for row in markup.inline_keyboard)
+
+def test_rendered_markup_does_not_share_rows():
+    """Изменение выданной разметки не портит общие ряды"""
+    game = MinesGame(1, 100)
+    game.get_field_display().inline_keyboard[0].clear()
+    
+    assert len(field_row(5, 0, 0, 0)) == 5
+    assert len(game.get_field_display().inline_keyboard[0]) == 5
+
+def test_field_markup_benchmark():
+    """Сборка поля из кэша рядов быстрее прежней сборки по кнопкам"""
+    boards = random_boards(200)
+    number = 5
+    legacy = timeit.timeit(lambda: [legacy_field_display(legacy) for game, legacy in boards], number=number)
+    cached = timeit.timeit(lambda: [game.get_field_display() for game, legacy in boards], number=number)
+    per_click = 1e6 / (len(boards) * number)
+    print(f"\nСборка поля, мкс: прежняя {legacy * per_click:.1f}, из кэша {cached * per_click:.1f}")
+    
+    assert cached * 3 < legacy
\ No newline at end of file
@@ -0,0 +1,26 @@
+# tests/test_profile_cache.py
+from database import ProfileCache, get_user_profile, register_user, reserve_bet, settle_bet, update_user_balance
+
+def test_writes_drop_cached_profile(db):
+    """После записи баланса профиль перечитывается из базы, а не берется из кэша"""
+    register_user(1, 'user1', 'Игрок')
+    update_user_balance(1, 1000)
+    assert get_user_profile(1)['stars_balance'] == 1000
+    
+    reserve_bet(1, 300)
+    assert get_user_profile(1)['stars_balance'] == 700
+    
+    settle_bet(1, 'dice', 300, 600, already_debited=True)
+    assert get_user_profile(1)['stars_balance'] == 1300
+
+def test_stale_fill_is_skipped_only_for_changed_user():
+    """Изменение одного пользователя не мешает кэшировать остальных"""
+    cache = ProfileCache(stripes=16)
+    first, second = cache.generation(1), cache.generation(2)
+    
+    cache.invalidate(2)
+    cache.put(1, {'stars_balance': 10}, first)
+    cache.put(2, {'stars_balance': 20}, second)
+    
+    assert cache.get(1) == {'stars_balance': 10}
+    assert cache.get(2) is None
\ No newline at end of file
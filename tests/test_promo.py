@@ -0,0 +1,91 @@
+# tests/test_promo.py
+import asyncio
+from database import add_promocode, commit_promo_claims, get_promocode, get_user_profile, transaction
+from promo import PromoEngine, PROMO_ALREADY_USED, PROMO_INVALID, PROMO_OK
+
+BURST_USERS = 10000
+
+def add_users(user_ids):
+    with transaction() as conn:
+        conn.executemany('''
+        INSERT INTO users (user_id, username, first_name, stars_balance) 
+        VALUES (?, ?, ?, 0)
+        ''', [(user_id, f'user{user_id}', 'Игрок') for user_id in user_ids])
+
+def count_claims(code):
+    with transaction() as conn:
+        return conn.execute('SELECT COUNT(*) FROM used_promocodes WHERE promocode = ?', (code,)).fetchone()[0]
+
+def total_balance():
+    with transaction() as conn:
+        return conn.execute('SELECT SUM(stars_balance) FROM users').fetchone()[0]
+
+def test_burst_does_not_overredeem(db):
+    """10 тысяч пользователей одновременно активируют промокод на 1000 активаций"""
+    user_ids = range(1, BURST_USERS + 1)
+    add_users(user_ids)
+    add_promocode('BURST', 5, 1000)
+    
+    async def burst():
+        engine = PromoEngine()
+        # Каждый пользователь жмет дважды: повторы должны отсекаться
+        return await asyncio.gather(*(
+            engine.redeem(user_id, 'BURST') for user_id in user_ids for _ in range(2)
+        ))
+    
+    results = asyncio.run(burst())
+    statuses = [status for status, reward in results]
+    
+    assert statuses.count(PROMO_OK) == 1000
+    assert statuses.count(PROMO_OK) + statuses.count(PROMO_INVALID) + statuses.count(PROMO_ALREADY_USED) == len(results)
+    assert get_promocode('BURST')['used'] == 1000
+    assert count_claims('BURST') == 1000
+    assert total_balance() == 5 * 1000
+
+def test_unlimited_code_burst(db):
+    """Промокод без лимита получают все, но каждый только один раз"""
+    user_ids = range(1, BURST_USERS + 1)
+    add_users(user_ids)
+    add_promocode('FREE', 1, None)
+    
+    async def burst():
+        engine = PromoEngine()
+        return await asyncio.gather(*(engine.redeem(user_id, 'FREE') for user_id in list(user_ids) * 2))
+    
+    statuses = [status for status, reward in asyncio.run(burst())]
+    
+    assert statuses.count(PROMO_OK) == BURST_USERS
+    assert statuses.count(PROMO_ALREADY_USED) == BURST_USERS
+    assert get_promocode('FREE')['used'] == BURST_USERS
+    assert total_balance() == BURST_USERS
+
+def test_database_guard_rejects_stale_counter(db):
+    """Если счетчик в базе ушел вперед памяти, лишние активации не записываются"""
+    add_users(range(1, 11))
+    add_promocode('LIMIT', 10, 5)
+    
+    async def redeem_all():
+        engine = PromoEngine()
+        await engine.redeem(1, 'LIMIT')  # промокод загружен в память
+        with transaction() as conn:
+            conn.execute("UPDATE promocodes SET used = max_uses WHERE code = 'LIMIT'")
+        return await asyncio.gather(*(engine.redeem(user_id, 'LIMIT') for user_id in range(2, 11)))
+    
+    statuses = [status for status, reward in asyncio.run(redeem_all())]
+    
+    assert statuses == [PROMO_INVALID] * 9
+    assert get_promocode('LIMIT')['used'] == 5
+    assert count_claims('LIMIT') == 1
+    assert get_user_profile(2)['stars_balance'] == 0
+
+def test_failed_claim_does_not_fail_batch(db):
+    """Активация несуществующего пользователя откатывается одна"""
+    add_users([1, 2])
+    add_promocode('MIXED', 7, None)
+    
+    results = commit_promo_claims([(1, 'MIXED', 7), (999, 'MIXED', 7), (2, 'MIXED', 7), (1, 'MIXED', 7)])
+    
+    assert results == [True, False, True, False]
+    assert get_promocode('MIXED')['used'] == 2
+    assert count_claims('MIXED') == 2
+    assert total_balance() == 14
\ No newline at end of file
@@ -0,0 +1,7 @@
+# tests/test_queries.py
+from database import HOT_QUERIES, find_full_scans
+
+def test_hot_queries_use_indexes(db):
+    """Частые запросы не должны читать таблицы целиком"""
+    assert HOT_QUERIES
+    assert find_full_scans() == {}
\ No newline at end of file
@@ -0,0 +1,26 @@
+# tests/test_routing.py
+from routing import (
+    ROUTE_COLOR, ROUTE_DICE, ROUTE_MINES, ROUTE_PURGE, ROUTE_ROULETTE, ROUTE_ROULETTE_BET,
+    build_prefix_trie, resolve_route
+)
+import routing
+
+def test_resolve_route():
+    assert resolve_route('Рулетка 100') == ROUTE_ROULETTE
+    assert resolve_route('рлт') == ROUTE_ROULETTE
+    assert resolve_route('красный 50') == ROUTE_COLOR
+    assert resolve_route('кубик 10') == ROUTE_DICE
+    assert resolve_route('мины 100 3 4x4') == ROUTE_MINES
+    assert resolve_route(' го ') == ROUTE_ROULETTE_BET
+    assert resolve_route('обнул') == ROUTE_PURGE
+    assert resolve_route('100 красное') == ROUTE_ROULETTE_BET
+    assert resolve_route('привет') is None
+    assert resolve_route('') is None
+
+def test_prefix_conflicts(monkeypatch):
+    """Из пересекающихся префиксов побеждает более короткий, из одинаковых - указанный раньше"""
+    trie = build_prefix_trie({'long': ('кубики',), 'short': ('куб',), 'first': ('мины',), 'second': ('мины',)})
+    monkeypatch.setattr(routing, 'PREFIX_TRIE', trie)
+    
+    assert resolve_route('кубики 10') == 'short'
+    assert resolve_route('мины 10') == 'first'
\ No newline at end of file
@@ -0,0 +1,101 @@
+# tests/test_ruletka.py
+import time
+from ruletka import ROULETTE_COLORS, parse_bet
+
+def legacy_parse_bet(bet_type):
+    """Прежняя цепочка проверок parse_bet (без отладочной печати), для сравнения.
+    Возвращает (тип, название, числа, множитель) или None"""
+    bet_type = bet_type.lower().strip()
+    
+    if bet_type.isdigit():
+        number = int(bet_type)
+        if 0 <= number <= 36:
+            return 'single', f'число {number}', frozenset([number]), 36
+    elif '-' in bet_type:
+        try:
+            start_end = bet_type.split('-')
+            if len(start_end) == 2:
+                start, end = int(start_end[0]), int(start_end[1])
+                if 1 <= start <= end <= 36:
+                    numbers = list(range(start, end + 1))
+                    return 'range', f'{start}-{end}', frozenset(numbers), round(36 / len(numbers), 1)
+        except:
+            pass
+    elif ',' in bet_type:
+        try:
+            numbers = [int(n.strip()) for n in bet_type.split(',')]
+            valid_numbers = [n for n in numbers if 0 <= n <= 36]
+            if valid_numbers:
+                return 'split', ', '.join(map(str, valid_numbers)), frozenset(valid_numbers), round(36 / len(valid_numbers), 1)
+        except:
+            pass
+    elif any(word in bet_type for word in ['красное', 'красный', 'red', 'крас']):
+        return 'red', 'красное', frozenset(n for n, c in ROULETTE_COLORS.items() if c == 'красный'), 2
+    elif any(word in bet_type for word in ['черное', 'черный', 'black', 'черн', 'чёрное', 'чёрный']):
+        return 'black', 'черное', frozenset(n for n, c in ROULETTE_COLORS.items() if c == 'черный'), 2
+    elif any(word in bet_type for word in ['нечетное', 'нечет', 'odd', 'нечётное', 'нечёт']):
+        return 'odd', 'нечетное', frozenset(range(1, 37, 2)), 2
+    elif any(word in bet_type for word in ['четное', 'чет', 'even', 'чётное', 'чёт']):
+        return 'even', 'четное', frozenset(range(2, 37, 2)), 2
+    elif bet_type in ['1-18', '1 18', '1/18', 'малое', 'малый']:
+        return 'low', '1-18', frozenset(range(1, 19)), 2
+    elif bet_type in ['19-36', '19 36', '19/36', 'большое', 'большой']:
+        return 'high', '19-36', frozenset(range(19, 37)), 2
+    elif bet_type in ['1-12', '1 12', '1/12']:
+        return 'dozen1', '1-12', frozenset(range(1, 13)), 3
+    elif bet_type in ['13-24', '13 24', '13/24']:
+        return 'dozen2', '13-24', frozenset(range(13, 25)), 3
+    elif bet_type in ['25-36', '25 36', '25/36']:
+        return 'dozen3', '25-36', frozenset(range(25, 37)), 3
+    elif any(word in bet_type for word in ['первая колонка', 'колонка1']):
+        return 'column1', '1 колонка', frozenset(range(3, 37, 3)), 3
+    elif any(word in bet_type for word in ['вторая колонка', 'колонка2']):
+        return 'column2', '2 колонка', frozenset(range(2, 36, 3)), 3
+    elif any(word in bet_type for word in ['третья колонка', 'колонка3']):
+        return 'column3', '3 колонка', frozenset(range(1, 35, 3)), 3
+    return None
+
+BET_INPUTS = [
+    *map(str, range(40)), '07', '100',
+    '1-18', '19-36', '1-12', '13-24', '25-36', '5-10', '1 - 18', '10-5', '0-3', '1-2-3', 'a-b',
+    '1,2,3', '0, 17, 36', '1,40', '40,41', '1,a',
+    'красное', 'красный', 'red', 'на красное', 'черное', 'чёрный', 'black', 'черн',
+    'нечетное', 'нечет', 'odd', 'нечётное', 'четное', 'чет', 'even', 'чёт',
+    'чет красное', 'черное красное', 'нечет черное', 'красное нечет', 'четное black',
+    '1 18', '1/18', 'малое', 'малый', '19 36', '19/36', 'большое', 'большой',
+    '1 12', '1/12', '13 24', '13/24', '25 36', '25/36',
+    'первая колонка', 'колонка1', 'вторая колонка', 'колонка2', 'третья колонка', 'колонка3',
+    'зеро', 'что-то', '', 'КРАСНОЕ', ' Чет ',
+]
+
+def spec_tuple(spec):
+    return None if spec is None else (spec.type, spec.name, frozenset(spec.numbers), spec.multiplier)
+
+def test_parse_bet_matches_legacy_chain():
+    """Новый разбор дает те же ставки, что и прежняя цепочка проверок"""
+    for bet_type in BET_INPUTS:
+        assert spec_tuple(parse_bet(bet_type)) == legacy_parse_bet(bet_type), bet_type
+
+def test_keyword_priority():
+    """При нескольких ключевых словах побеждает более ранняя группа, а не первое слово в тексте"""
+    assert parse_bet('чет красное').type == 'red'
+    assert parse_bet('черное красное').type == 'red'
+    assert parse_bet('четное нечетное').type == 'odd'
+
+def test_parse_bet_benchmark():
+    """Разбор без кэша быстрее прежней цепочки, с кэшем - еще быстрее"""
+    inputs = BET_INPUTS * 300
+    
+    def measure(parse):
+        started = time.perf_counter()
+        for bet_type in inputs:
+            parse(bet_type)
+        return len(inputs) / (time.perf_counter() - started)
+    
+    legacy = measure(legacy_parse_bet)
+    uncached = measure(parse_bet.__wrapped__)
+    cached = measure(parse_bet)
+    print(f"\nРазборов в секунду: прежний {legacy:.0f}, без кэша {uncached:.0f}, с кэшем {cached:.0f}")
+    
+    assert uncached > legacy
+    assert cached > uncached
\ No newline at end of file